@@ -1,24 +1,97 @@
 #!/usr/bin/env python3
 """FastAPI server for n8n workflow templates."""
 
+import asyncio
+import base64
+import functools
 import json
 import os
 import sqlite3
 import hashlib
+import importlib
+import math
+import time
+import threading
+import queue
+import select
+import struct
+import ctypes
+import ctypes.util
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal, Tuple
 from contextlib import contextmanager
 import re
+import zlib
+from collections import Counter, OrderedDict
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter
+from pydantic_core import to_json
 import uvicorn
 
+try:
+    import numpy as np
+except ImportError:  # optional: only rank=vector/hybrid need it
+    np = None
+
 # Configuration
 DATABASE_PATH = Path(os.getenv("DATABASE_PATH", "./data/workflows.db"))
 TEMPLATES_DIR = Path(os.getenv("TEMPLATES_DIR", "./templates"))
+CATEGORIES_FILE = Path("def_categories.json")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "65536"))
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "10"))
+FTS_COLUMNS = ["id", "name", "description", "services", "use_cases"]
+SEARCH_BM25_WEIGHTS = {"id": 0.0, "name": 10.0, "description": 4.0, "services": 6.0, "use_cases": 2.0}
+SEARCH_BM25_WEIGHTS.update({
+    column.strip(): float(weight)
+    for column, weight in (
+        item.split("=", 1) for item in os.getenv("SEARCH_BM25_WEIGHTS", "").split(",") if "=" in item
+    )
+})
+SEARCH_HIGHLIGHT_TAGS = ("<mark>", "</mark>")
+SEARCH_SNIPPET_TOKENS = 16
+SCHEMA_VERSION = 8
+POPULARITY_SCORER = os.getenv("POPULARITY_SCORER", "default")  # registry name or module:function
+FTS_AUTOMERGE = 4  # FTS5 default
+FTS_MERGE_PAGES = 500
+FTS_OPTIMIZE_MIN_ROWS = 1000
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", str(DB_POOL_SIZE)))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0"))  # 0 = one per CPU
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_MIN_PARALLEL_FILES = 64  # below this a process pool costs more than it saves
+TEMPLATES_WATCH = os.getenv("TEMPLATES_WATCH", "off").lower()  # off, auto, inotify or poll
+TEMPLATES_WATCH_DEBOUNCE = float(os.getenv("TEMPLATES_WATCH_DEBOUNCE", "1.0"))
+TEMPLATES_WATCH_POLL_INTERVAL = float(os.getenv("TEMPLATES_WATCH_POLL_INTERVAL", "5.0"))
+WATCH_BATCH_SIZE = 50
+EXPORT_FETCH_SIZE = 200
+TEMPLATE_BATCH_MAX = int(os.getenv("TEMPLATE_BATCH_MAX", "100"))  # ids per /api/templates/batch request
+WORKFLOW_STORAGE = os.getenv("WORKFLOW_STORAGE", "json").lower()  # json (inline text), zlib or zlib-dict
+WORKFLOW_STORAGE_MODES = ("json", "zlib", "zlib-dict")
+BODY_ZLIB_LEVEL = 6
+BODY_DICT_SIZE = 32 * 1024  # zlib's window; a larger preset dictionary is never referenced
+BODY_DICT_SAMPLES = 500
+INDEX_GENERATION_TTL = float(os.getenv("INDEX_GENERATION_TTL", "1.0"))  # seconds between generation re-reads
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "0"))  # 0 = clients always revalidate
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))  # 0 disables
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "10000"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "auto").lower()  # auto (built when numpy is installed) or off
+VECTOR_INDEX_PATH = DATABASE_PATH.with_name(DATABASE_PATH.name + ".vectors.npz")
+VECTOR_DIMENSIONS = int(os.getenv("VECTOR_DIMENSIONS", "128"))
+VECTOR_MAX_TERMS = 8192
+VECTOR_CANDIDATES = 200  # depth of each ranking fused by rank=hybrid
+RRF_K = 60  # reciprocal rank fusion constant
+VECTOR_REBUILD_DELAY = float(os.getenv("VECTOR_REBUILD_DELAY", "5.0"))  # seconds to batch watcher changes per rebuild
+# Signatures are stored at ingest; changing these needs --force-reindex
+MINHASH_PERMUTATIONS = 128
+MINHASH_BANDS = 32  # 4 rows per band: pairs above ~0.42 Jaccard almost always share a bucket
+SIMILAR_CANDIDATES = 500  # LSH candidates scored per /similar lookup
 
 # FastAPI app
 app = FastAPI(
@@ -48,11 +121,27 @@ class WorkflowTemplate(BaseModel):
     complexity: str
     use_cases: List[str]
     
+class SearchResult(WorkflowTemplate):
+    score: Optional[float] = None  # bm25 relevance, higher is better
+    highlights: Optional[Dict[str, str]] = None
+
+class SimilarTemplate(WorkflowTemplate):
+    similarity: float  # estimated Jaccard similarity of node types, services and edges
+
 class SearchRequest(BaseModel):
     query: str
     category: Optional[str] = None
     trigger_type: Optional[str] = None
     limit: int = 20
+    services: Optional[List[str]] = None
+    services_mode: Literal["all", "any"] = "all"  # match every listed service, or at least one
+    rank: Literal["bm25", "nodes_count", "vector", "hybrid"] = "bm25"
+    weights: Optional[Dict[str, float]] = None  # per-column bm25 weights, e.g. {"name": 10}
+    highlight: bool = False
+    fields: Optional[List[str]] = None  # only return these result fields
+    exclude: Optional[List[str]] = None  # leave these result fields out
+    view: Literal["full", "summary"] = "full"
+    cursor: Optional[str] = None  # X-Next-Cursor from the previous page
 
 class TemplateMetadata(BaseModel):
     id: str
@@ -63,22 +152,149 @@ class TemplateMetadata(BaseModel):
     connections: Dict[str, Any]
     statistics: Dict[str, int]
 
+class TemplateBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=TEMPLATE_BATCH_MAX)
+    fields: Optional[List[str]] = None
+    exclude: Optional[List[str]] = None
+    view: Literal["full", "summary"] = "full"
+
+# Response projections: "summary" views leave out the bulky fields
+TEMPLATE_FIELDS = list(TemplateMetadata.model_fields)
+TEMPLATE_SUMMARY_FIELDS = ["id", "name", "description", "statistics"]
+TEMPLATE_BODY_FIELDS = {"workflow_json", "nodes", "connections"}
+SEARCH_FIELDS = list(SearchResult.model_fields)
+SEARCH_SUMMARY_FIELDS = ["id", "name", "description", "category", "score"]
+
+def resolve_projection(available: List[str], fields: Optional[List[str]], exclude: Optional[List[str]],
+                       view: str, summary: List[str]) -> List[str]:
+    """Return the fields to include, in response order.
+
+    ``fields`` takes precedence over ``view``; ``exclude`` is applied last.
+    """
+    for name in [*(fields or []), *(exclude or [])]:
+        if name not in available:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Unknown field '{name}', expected one of {', '.join(available)}"
+            )
+    selected = set(fields or (summary if view == "summary" else available))
+    selected.difference_update(exclude or [])
+    return [name for name in available if name in selected]
+
+def split_fields(value: Optional[str]) -> Optional[List[str]]:
+    """Parse a comma-separated ``fields``/``exclude`` query parameter."""
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(",") if name.strip()]
+
 # Database connection
+def connect_db(read_only: bool = False) -> sqlite3.Connection:
+    """Open a tuned SQLite connection.
+
+    Connections are long-lived, so the page cache, mmap window and prepared
+    statement cache survive across requests. Read-only connections open the
+    file with mode=ro, so they fail on a missing database instead of
+    creating an empty one.
+    """
+    conn = sqlite3.connect(
+        DATABASE_PATH.resolve().as_uri() + "?mode=ro" if read_only else DATABASE_PATH,
+        uri=read_only,
+        timeout=DB_BUSY_TIMEOUT,
+        cached_statements=DB_STATEMENT_CACHE,
+        check_same_thread=False
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    if not read_only:
+        conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+class ConnectionPool:
+    """Bounded pool of read-only connections.
+
+    A thread keeps the connection it checked out for the whole ``with`` block
+    (nested ``get_db()`` calls on the same thread reuse it), and idle
+    connections are handed out most-recently-used first to keep caches warm.
+    """
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._local = threading.local()
+
+    @contextmanager
+    def connection(self):
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+        
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = connect_db(read_only=True)
+            self._local.conn = conn
+            try:
+                yield conn
+            finally:
+                self._local.conn = None
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+_read_pool: Optional[ConnectionPool] = None
+_read_pool_lock = threading.Lock()
+_writer_conn: Optional[sqlite3.Connection] = None
+_writer_lock = threading.RLock()
+
 @contextmanager
 def get_db():
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
+    """Check out a pooled read connection."""
+    global _read_pool
+    if _read_pool is None:
+        with _read_pool_lock:
+            if _read_pool is None:
+                _read_pool = ConnectionPool(DB_POOL_SIZE)
+    with _read_pool.connection() as conn:
         yield conn
-    finally:
-        conn.close()
+
+@contextmanager
+def get_write_db():
+    """Use the single dedicated writer connection (ingestion, schema changes).
+
+    Callers hold it exclusively for the ``with`` block; any uncommitted work
+    is rolled back if the block raises.
+    """
+    global _writer_conn
+    with _writer_lock:
+        if _writer_conn is None:
+            _writer_conn = connect_db()
+        try:
+            yield _writer_conn
+        except BaseException:
+            if _writer_conn.in_transaction:
+                _writer_conn.rollback()
+            raise
 
 def load_categories_mapping():
     """Load category definitions from def_categories.json."""
     try:
-        categories_file = Path("def_categories.json")
-        if categories_file.exists():
-            with open(categories_file, 'r', encoding='utf-8') as f:
+        if CATEGORIES_FILE.exists():
+            with open(CATEGORIES_FILE, 'r', encoding='utf-8') as f:
                 return json.loads(f.read())
     except Exception as e:
         print(f"Warning: Could not load def_categories.json: {e}")
@@ -187,6 +403,123 @@ def categorize_workflow(services: set, nodes: List[Dict], categories_mapping: Di
     
     return "General"
 
+class CategoryClassifier:
+    """Precompiled category matcher equivalent to categorize_workflow.
+
+    All keywords of the mapping are compiled once into an Aho-Corasick
+    automaton, so every category is scored in a single pass over the text
+    instead of one substring search per keyword.
+    """
+
+    def __init__(self, categories_mapping: Dict[str, List[str]]):
+        self.categories = [c for c in categories_mapping if c != "General"]
+        self.base_scores = [0] * len(self.categories)
+        
+        keyword_ids: Dict[str, int] = {}
+        self.keyword_lengths: List[int] = []
+        self.keyword_categories: List[Dict[int, int]] = []
+        for index, category in enumerate(self.categories):
+            for keyword in categories_mapping[category]:
+                keyword_lower = keyword.lower()
+                if not keyword_lower:
+                    # "" is a substring of everything, so it always scores as a service match
+                    self.base_scores[index] += 10
+                    continue
+                if keyword_lower not in keyword_ids:
+                    keyword_ids[keyword_lower] = len(self.keyword_lengths)
+                    self.keyword_lengths.append(len(keyword_lower))
+                    self.keyword_categories.append({})
+                counts = self.keyword_categories[keyword_ids[keyword_lower]]
+                counts[index] = counts.get(index, 0) + 1
+        
+        self._build_automaton(keyword_ids)
+
+    def _build_automaton(self, keyword_ids: Dict[str, int]):
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for keyword, keyword_id in keyword_ids.items():
+            state = 0
+            for char in keyword:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state].append(keyword_id)
+        
+        # Breadth-first pass: resolve failure links and flatten them into a
+        # full transition table so scanning never has to follow fail links.
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        frontier = list(goto[0].values())
+        for state in frontier:
+            delta[state] = dict(delta[fail[state]])
+            delta[state].update(goto[state])
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            for char, child in goto[state].items():
+                fail[child] = delta[fail[state]].get(char, 0) if state else 0
+                frontier.append(child)
+        
+        self.delta = delta
+        self.outputs = [tuple(o) for o in outputs]
+
+    def categorize(self, services: set, nodes: List[Dict]) -> str:
+        """Return the best category for a workflow, same rules as categorize_workflow."""
+        services_text = ' '.join([s.lower() for s in services])
+        nodes_text = ' '.join([n.get("type", "").lower() for n in nodes])
+        all_text = f"{services_text} {nodes_text}"
+        services_end = len(services_text)
+        
+        # Best match tier per keyword: 10 in services, 5 in node types,
+        # 1 when the match only exists across the joining space.
+        tiers: Dict[int, int] = {}
+        delta = self.delta
+        outputs = self.outputs
+        state = 0
+        for position, char in enumerate(all_text):
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                for keyword_id in outputs[state]:
+                    if position < services_end:
+                        tier = 10
+                    elif position - self.keyword_lengths[keyword_id] >= services_end:
+                        tier = 5
+                    else:
+                        tier = 1
+                    if tier > tiers.get(keyword_id, 0):
+                        tiers[keyword_id] = tier
+        
+        scores = list(self.base_scores)
+        for keyword_id, tier in tiers.items():
+            for index, count in self.keyword_categories[keyword_id].items():
+                scores[index] += tier * count
+        
+        best_index = None
+        for index, score in enumerate(scores):
+            if score > 0 and (best_index is None or score > scores[best_index]):
+                best_index = index
+        
+        return self.categories[best_index] if best_index is not None else "General"
+
+_category_classifier: Optional[CategoryClassifier] = None
+_category_classifier_key = None
+
+def get_category_classifier() -> CategoryClassifier:
+    """Return the shared classifier, rebuilding it only when def_categories.json changes."""
+    global _category_classifier, _category_classifier_key
+    
+    try:
+        stat = CATEGORIES_FILE.stat()
+        key = (str(CATEGORIES_FILE.resolve()), stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        key = None
+    
+    if _category_classifier is None or key != _category_classifier_key:
+        _category_classifier = CategoryClassifier(load_categories_mapping())
+        _category_classifier_key = key
+    
+    return _category_classifier
+
 def generate_intelligent_name(workflow_json: Dict, filename: str, services: set, trigger_type: str) -> str:
     """Generate intelligent workflow name following GitHub pattern."""
     # Try to get name from workflow JSON first
@@ -229,12 +562,126 @@ def generate_intelligent_name(workflow_json: Dict, filename: str, services: set,
     # Ultimate fallback
     return filename_base.replace('_', ' ').replace('-', ' ').title()
 
-def extract_workflow_metadata(workflow_json: Dict[str, Any], filename: str) -> Dict[str, Any]:
+def count_node_types(nodes: List[Dict]) -> Dict[str, int]:
+    """Count nodes per node type, in first-seen order."""
+    node_types = {}
+    for node in nodes:
+        node_type = node.get("type", "unknown")
+        node_types[node_type] = node_types.get(node_type, 0) + 1
+    return node_types
+
+def template_statistics(nodes: List[Dict], connections: Dict[str, Any]) -> Dict[str, int]:
+    """Node and connection counts reported by /api/template/{id}."""
+    node_types = count_node_types(nodes)
+    return {
+        "total_nodes": len(nodes),
+        "connection_count": sum(len(c) for c in connections.values()),
+        "unique_node_types": len(node_types),
+        **node_types
+    }
+
+def structure_features(nodes: List[Dict], connections: Dict[str, Any], services) -> set:
+    """Node types, services and (source type, target type) edges of a workflow."""
+    node_types = {node.get("name"): node.get("type", "unknown") for node in nodes if isinstance(node, dict)}
+    features = {f"node:{node_type}" for node_type in node_types.values()}
+    features.update(f"service:{service.lower()}" for service in services)
+    for source, outputs in (connections or {}).items():
+        if source not in node_types or not isinstance(outputs, dict):
+            continue
+        for branches in outputs.values():
+            for branch in branches or []:
+                for edge in branch or []:
+                    target = edge.get("node") if isinstance(edge, dict) else None
+                    if target in node_types:
+                        features.add(f"edge:{node_types[source]}>{node_types[target]}")
+    return features
+
+MINHASH_FORMAT = struct.Struct(f"<{MINHASH_PERMUTATIONS}I")
+
+def minhash_signature(features: set) -> Optional[bytes]:
+    """MinHash signature of a feature set, or None for an empty set.
+
+    Each feature is hashed once with SHAKE-128 and its output read as
+    MINHASH_PERMUTATIONS independent 32-bit hashes.
+    """
+    if not features:
+        return None
+    digests = [hashlib.shake_128(feature.encode("utf-8")).digest(MINHASH_FORMAT.size) for feature in features]
+    if np is not None:
+        return np.frombuffer(b"".join(digests), dtype="<u4").reshape(len(digests), -1).min(axis=0).tobytes()
+    return MINHASH_FORMAT.pack(*map(min, *map(MINHASH_FORMAT.unpack, digests)))
+
+def lsh_buckets(signature: bytes) -> List[Tuple[int, int]]:
+    """``(band, bucket)`` keys of a signature for LSH banding."""
+    width = len(signature) // MINHASH_BANDS
+    return [
+        (band, int.from_bytes(hashlib.blake2b(signature[band * width:(band + 1) * width], digest_size=8).digest(),
+                              "little", signed=True))
+        for band in range(MINHASH_BANDS)
+    ]
+
+def minhash_similarities(signature: bytes, others: List[bytes]) -> List[float]:
+    """Estimated Jaccard similarities: the share of matching signature slots."""
+    if np is not None and others:
+        matrix = np.frombuffer(b"".join(others), dtype="<u4").reshape(len(others), -1)
+        return (matrix == np.frombuffer(signature, dtype="<u4")).mean(axis=1).tolist()
+    slots = MINHASH_FORMAT.unpack(signature)
+    return [sum(x == y for x, y in zip(slots, MINHASH_FORMAT.unpack(other))) / MINHASH_PERMUTATIONS
+            for other in others]
+
+def write_signatures(conn, signatures: List[Tuple[str, Optional[bytes]]]):
+    """Replace the MinHash signatures and LSH buckets of some workflows."""
+    ids = [(workflow_id,) for workflow_id, _ in signatures]
+    conn.executemany("DELETE FROM workflow_minhash WHERE workflow_id = ?", ids)
+    conn.executemany("DELETE FROM workflow_lsh WHERE workflow_id = ?", ids)
+    signatures = [(workflow_id, signature) for workflow_id, signature in signatures if signature]
+    conn.executemany("INSERT INTO workflow_minhash (workflow_id, signature) VALUES (?, ?)", signatures)
+    conn.executemany(
+        "INSERT OR IGNORE INTO workflow_lsh (band, bucket, workflow_id) VALUES (?, ?, ?)",
+        [(band, bucket, workflow_id)
+         for workflow_id, signature in signatures for band, bucket in lsh_buckets(signature)]
+    )
+
+def detect_ai_usage(nodes: List[Dict]) -> bool:
+    """Detect AI/LLM usage anywhere in the node definitions."""
+    return any(any(keyword in str(n).lower() for keyword in ["ai", "openai", "gpt", "llm", "claude", "anthropic", "langchain"]) for n in nodes)
+
+COMPLEXITY_RANK = {"simple": 1, "intermediate": 2, "advanced": 3}
+
+def default_popularity(complexity: str, has_ai: bool, nodes_count: int) -> float:
+    """Complexity first, then AI usage, then node count (the original /api/popular order)."""
+    return (COMPLEXITY_RANK.get(complexity, 1) * 1_000_000 +
+            (100_000 if has_ai else 0) +
+            min(nodes_count or 0, 99_999))
+
+def balanced_popularity(complexity: str, has_ai: bool, nodes_count: int) -> float:
+    """Blend the three signals so a large non-AI workflow can outrank a small AI one."""
+    return (COMPLEXITY_RANK.get(complexity, 1) * 10 +
+            (15 if has_ai else 0) +
+            10 * math.log1p(nodes_count or 0))
+
+POPULARITY_SCORERS = {
+    "default": default_popularity,
+    "balanced": balanced_popularity,
+}
+
+def get_popularity_scorer(name: Optional[str] = None):
+    """Resolve a scorer by registry name or ``module:function`` path."""
+    name = name or POPULARITY_SCORER
+    if name in POPULARITY_SCORERS:
+        return POPULARITY_SCORERS[name]
+    if ":" in name:
+        module_name, function_name = name.split(":", 1)
+        return getattr(importlib.import_module(module_name), function_name)
+    raise ValueError(f"Unknown popularity scorer: {name}")
+
+def extract_workflow_metadata(workflow_json: Dict[str, Any], filename: str,
+                              popularity_scorer: Optional[str] = None) -> Dict[str, Any]:
     """Extract metadata from workflow JSON with improved logic."""
     nodes = workflow_json.get("nodes", [])
     
-    # Load categories mapping
-    categories_mapping = load_categories_mapping()
+    # Shared classifier, compiled once from def_categories.json
+    classifier = get_category_classifier()
     
     # Extract services with improved logic
     services = extract_services_from_nodes(nodes)
@@ -245,7 +692,7 @@ def extract_workflow_metadata(workflow_json: Dict[str, Any], filename: str) -> D
     # Determine complexity based on node count and types
     node_count = len(nodes)
     has_code = any("code" in n.get("type", "").lower() for n in nodes)
-    has_ai = any(any(keyword in str(n).lower() for keyword in ["ai", "openai", "gpt", "llm", "claude", "anthropic", "langchain"]) for n in nodes)
+    has_ai = detect_ai_usage(nodes)
     has_webhook = trigger_type == "webhook"
     
     # Enhanced complexity classification
@@ -275,7 +722,7 @@ def extract_workflow_metadata(workflow_json: Dict[str, Any], filename: str) -> D
                 description += " with AI-powered processing"
     
     # Categorize workflow with improved logic
-    category = categorize_workflow(services, nodes, categories_mapping)
+    category = classifier.categorize(services, nodes)
     
     # Generate enhanced use cases
     use_cases = []
@@ -304,13 +751,17 @@ def extract_workflow_metadata(workflow_json: Dict[str, Any], filename: str) -> D
         "trigger_type": trigger_type,
         "complexity": complexity,
         "use_cases": use_cases,
+        "has_ai": has_ai,
+        "popularity": get_popularity_scorer(popularity_scorer)(complexity, has_ai, node_count),
         "workflow_json": workflow_json
     }
 
 # Initialize database
 def init_database():
     """Initialize SQLite database with FTS5 for fast search."""
-    with get_db() as conn:
+    with get_write_db() as conn:
+        # WAL lets API readers keep going while the watcher or --populate writes
+        conn.execute("PRAGMA journal_mode=WAL")
         conn.executescript("""
             CREATE TABLE IF NOT EXISTS workflows (
                 id TEXT PRIMARY KEY,
@@ -325,7 +776,11 @@ def init_database():
                 workflow_json TEXT,
                 file_hash TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                has_ai INTEGER,
+                popularity REAL,
+                statistics TEXT,
+                body_layout TEXT
             );
             
             CREATE VIRTUAL TABLE IF NOT EXISTS workflows_fts USING fts5(
@@ -333,432 +788,2430 @@ def init_database():
                 content=workflows
             );
             
-            CREATE TRIGGER IF NOT EXISTS workflows_ai AFTER INSERT ON workflows BEGIN
-                INSERT INTO workflows_fts(id, name, description, services, use_cases)
-                VALUES (new.id, new.name, new.description, new.services, new.use_cases);
-            END;
-            
-            CREATE TRIGGER IF NOT EXISTS workflows_au AFTER UPDATE ON workflows BEGIN
-                UPDATE workflows_fts 
-                SET name = new.name,
-                    description = new.description,
-                    services = new.services,
-                    use_cases = new.use_cases
-                WHERE id = new.id;
-            END;
-            
             CREATE INDEX IF NOT EXISTS idx_workflows_category ON workflows(category);
             CREATE INDEX IF NOT EXISTS idx_workflows_trigger ON workflows(trigger_type);
             CREATE INDEX IF NOT EXISTS idx_workflows_complexity ON workflows(complexity);
+            
+            CREATE TABLE IF NOT EXISTS template_manifest (
+                path TEXT PRIMARY KEY,
+                workflow_id TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                file_hash TEXT
+            );
+            
+            CREATE INDEX IF NOT EXISTS idx_manifest_workflow ON template_manifest(workflow_id);
+            
+            CREATE TABLE IF NOT EXISTS workflow_services (
+                workflow_id TEXT NOT NULL,
+                service TEXT NOT NULL COLLATE NOCASE,
+                PRIMARY KEY (workflow_id, service)
+            ) WITHOUT ROWID;
+            
+            CREATE INDEX IF NOT EXISTS idx_workflow_services_service ON workflow_services(service, workflow_id);
+            
+            CREATE TABLE IF NOT EXISTS workflow_node_types (
+                workflow_id TEXT NOT NULL,
+                node_type TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (workflow_id, node_type)
+            ) WITHOUT ROWID;
+            
+            CREATE INDEX IF NOT EXISTS idx_workflow_node_types_type ON workflow_node_types(node_type, workflow_id);
+            
+            CREATE TABLE IF NOT EXISTS facet_counts (
+                facet TEXT NOT NULL,
+                value TEXT NOT NULL COLLATE NOCASE,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (facet, value)
+            ) WITHOUT ROWID;
+            
+            CREATE TABLE IF NOT EXISTS index_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            
+            -- Named choices the stored rows depend on (index_meta holds counters)
+            CREATE TABLE IF NOT EXISTS index_settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            
+            -- Compressed workflow_json, used instead of the inline column
+            -- when WORKFLOW_STORAGE is zlib or zlib-dict
+            CREATE TABLE IF NOT EXISTS workflow_bodies (
+                workflow_id TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                body BLOB NOT NULL
+            );
+            
+            CREATE TABLE IF NOT EXISTS compression_dicts (
+                codec TEXT PRIMARY KEY,
+                dict BLOB NOT NULL
+            );
+            
+            -- MinHash signatures of node types, services and edges, banded
+            -- into LSH buckets for /api/template/{id}/similar
+            CREATE TABLE IF NOT EXISTS workflow_minhash (
+                workflow_id TEXT PRIMARY KEY,
+                signature BLOB NOT NULL
+            );
+            
+            CREATE TABLE IF NOT EXISTS workflow_lsh (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                workflow_id TEXT NOT NULL,
+                PRIMARY KEY (band, bucket, workflow_id)
+            ) WITHOUT ROWID;
+            
+            CREATE INDEX IF NOT EXISTS idx_workflow_lsh_workflow ON workflow_lsh(workflow_id);
         """)
+        migrate_database(conn)
 
-def populate_database(force_reindex=False):
-    """Populate database with workflow templates from templates directory."""
-    templates_dir = Path(os.getenv("TEMPLATES_DIR", "./templates"))
+# workflows_fts is an external-content table: it stores only the index, so
+# every change must remove the old terms ('delete' with the old values) before
+# adding the new ones, keyed by the workflows rowid.
+FTS_TRIGGERS_SQL = """
+    DROP TRIGGER IF EXISTS workflows_ai;
+    DROP TRIGGER IF EXISTS workflows_au;
+    DROP TRIGGER IF EXISTS workflows_ad;
     
-    if not templates_dir.exists():
-        print(f"Creating templates directory: {templates_dir}")
-        templates_dir.mkdir(parents=True, exist_ok=True)
-        return
-        
-    json_files = list(templates_dir.glob("*.json"))
-    print(f"Found {len(json_files)} workflow files")
+    CREATE TRIGGER workflows_ai AFTER INSERT ON workflows BEGIN
+        INSERT INTO workflows_fts(rowid, id, name, description, services, use_cases)
+        VALUES (new.rowid, new.id, new.name, new.description, new.services, new.use_cases);
+    END;
     
-    if not json_files:
-        print("No workflow files found. Database remains empty.")
-        return
+    CREATE TRIGGER workflows_ad AFTER DELETE ON workflows BEGIN
+        INSERT INTO workflows_fts(workflows_fts, rowid, id, name, description, services, use_cases)
+        VALUES ('delete', old.rowid, old.id, old.name, old.description, old.services, old.use_cases);
+    END;
     
-    with get_db() as conn:
-        cursor = conn.cursor()
-        
-        imported = 0
-        updated = 0
-        skipped = 0
-        
-        for json_file in json_files:
-            try:
-                # Read file
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    workflow_json = json.loads(content)
-                
-                # Calculate file hash
-                file_hash = hashlib.md5(content.encode()).hexdigest()
-                
-                # Generate ID from filename
-                workflow_id = json_file.stem
-                
-                # Check if needs update
-                cursor.execute("SELECT file_hash FROM workflows WHERE id = ?", (workflow_id,))
-                existing = cursor.fetchone()
-                
-                if existing and existing[0] == file_hash and not force_reindex:
-                    skipped += 1
-                    continue
-                
-                # Extract metadata
-                metadata = extract_workflow_metadata(workflow_json, str(json_file))
-                
-                # Prepare data
-                data = (
-                    workflow_id,
-                    metadata["name"],
-                    metadata["description"],
-                    metadata["category"],
-                    metadata["nodes_count"],
-                    json.dumps(metadata["services"]),
-                    metadata["trigger_type"],
-                    metadata["complexity"],
-                    json.dumps(metadata["use_cases"]),
-                    json.dumps(workflow_json),
-                    file_hash
-                )
-                
-                if existing:
-                    # Update existing
-                    cursor.execute("""
-                        UPDATE workflows 
-                        SET name=?, description=?, category=?, nodes_count=?, 
-                            services=?, trigger_type=?, complexity=?, use_cases=?,
-                            workflow_json=?, file_hash=?, updated_at=CURRENT_TIMESTAMP
-                        WHERE id=?
-                    """, data[1:] + (workflow_id,))
-                    updated += 1
-                else:
-                    # Insert new
-                    cursor.execute("""
-                        INSERT INTO workflows 
-                        (id, name, description, category, nodes_count, services, 
-                         trigger_type, complexity, use_cases, workflow_json, file_hash)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, data)
-                    imported += 1
-                    
-            except Exception as e:
-                print(f"Error processing {json_file}: {e}")
-        
-        conn.commit()
-        
-        # Print statistics
-        cursor.execute("SELECT COUNT(*) FROM workflows")
-        total = cursor.fetchone()[0]
-        
-        print(f"\nDatabase population complete:")
-        print(f"  Total workflows: {total}")
-        print(f"  Imported: {imported}")
-        print(f"  Updated: {updated}")
-        print(f"  Skipped: {skipped}")
-        
-        # Show category distribution
-        cursor.execute("""
-            SELECT category, COUNT(*) as count 
-            FROM workflows 
-            GROUP BY category 
-            ORDER BY count DESC
+    CREATE TRIGGER workflows_au AFTER UPDATE OF id, name, description, services, use_cases ON workflows BEGIN
+        INSERT INTO workflows_fts(workflows_fts, rowid, id, name, description, services, use_cases)
+        VALUES ('delete', old.rowid, old.id, old.name, old.description, old.services, old.use_cases);
+        INSERT INTO workflows_fts(rowid, id, name, description, services, use_cases)
+        VALUES (new.rowid, new.id, new.name, new.description, new.services, new.use_cases);
+    END;
+"""
+
+def facet_trigger_sql(facet: str, column: str, row: str, delta: str) -> str:
+    return f"""
+        INSERT INTO facet_counts (facet, value, count)
+        SELECT '{facet}', {row}.{column}, {delta} WHERE {row}.{column} IS NOT NULL
+        ON CONFLICT(facet, value) DO UPDATE SET count = count + ({delta});
+        DELETE FROM facet_counts WHERE facet = '{facet}' AND value = {row}.{column} AND count <= 0;
+    """
+
+WORKFLOW_FACETS = [("category", "category"), ("trigger_type", "trigger_type"), ("complexity", "complexity")]
+
+# Summary tables are maintained by triggers, so they change in the same
+# transaction as every ingest batch, watcher update and purge.
+SUMMARY_TRIGGERS_SQL = f"""
+    DROP TRIGGER IF EXISTS workflows_summary_ai;
+    DROP TRIGGER IF EXISTS workflows_summary_ad;
+    DROP TRIGGER IF EXISTS workflows_summary_au;
+    DROP TRIGGER IF EXISTS workflow_services_summary_ai;
+    DROP TRIGGER IF EXISTS workflow_services_summary_ad;
+    
+    CREATE TRIGGER workflows_summary_ai AFTER INSERT ON workflows BEGIN
+        {''.join(facet_trigger_sql(facet, column, "new", "1") for facet, column in WORKFLOW_FACETS)}
+        UPDATE index_meta SET value = value + 1 WHERE key = 'total_workflows';
+        UPDATE index_meta SET value = value + COALESCE(new.nodes_count, 0) WHERE key = 'total_nodes';
+    END;
+    
+    CREATE TRIGGER workflows_summary_ad AFTER DELETE ON workflows BEGIN
+        {''.join(facet_trigger_sql(facet, column, "old", "-1") for facet, column in WORKFLOW_FACETS)}
+        UPDATE index_meta SET value = value - 1 WHERE key = 'total_workflows';
+        UPDATE index_meta SET value = value - COALESCE(old.nodes_count, 0) WHERE key = 'total_nodes';
+    END;
+    
+    CREATE TRIGGER workflows_summary_au AFTER UPDATE OF category, trigger_type, complexity, nodes_count ON workflows BEGIN
+        {''.join(facet_trigger_sql(facet, column, "old", "-1") for facet, column in WORKFLOW_FACETS)}
+        {''.join(facet_trigger_sql(facet, column, "new", "1") for facet, column in WORKFLOW_FACETS)}
+        UPDATE index_meta SET value = value - COALESCE(old.nodes_count, 0) + COALESCE(new.nodes_count, 0)
+        WHERE key = 'total_nodes';
+    END;
+    
+    CREATE TRIGGER workflow_services_summary_ai AFTER INSERT ON workflow_services BEGIN
+        {facet_trigger_sql("service", "service", "new", "1")}
+    END;
+    
+    CREATE TRIGGER workflow_services_summary_ad AFTER DELETE ON workflow_services BEGIN
+        {facet_trigger_sql("service", "service", "old", "-1")}
+    END;
+"""
+
+def refresh_summary_tables(conn):
+    """Recompute facet_counts and the index_meta totals from scratch."""
+    conn.execute("DELETE FROM facet_counts")
+    for facet, column in WORKFLOW_FACETS:
+        conn.execute(f"""
+            INSERT INTO facet_counts (facet, value, count)
+            SELECT '{facet}', {column}, COUNT(*) FROM workflows
+            WHERE {column} IS NOT NULL GROUP BY {column}
         """)
-        
-        print("\nCategories:")
-        for row in cursor.fetchall():
-            print(f"  {row[0]}: {row[1]}")
-        
-        # Show trigger type distribution
-        cursor.execute("""
-            SELECT trigger_type, COUNT(*) as count 
-            FROM workflows 
-            WHERE trigger_type IS NOT NULL
-            GROUP BY trigger_type 
-            ORDER BY count DESC
+    conn.execute("""
+        INSERT INTO facet_counts (facet, value, count)
+        SELECT 'service', service, COUNT(*) FROM workflow_services GROUP BY service
+    """)
+    conn.execute("""
+        INSERT OR REPLACE INTO index_meta (key, value)
+        SELECT 'total_workflows', COUNT(*) FROM workflows
+        UNION ALL
+        SELECT 'total_nodes', COALESCE(SUM(nodes_count), 0) FROM workflows
+    """)
+
+def read_facet(conn, facet: str, limit: int = -1) -> List[tuple]:
+    """Return ``(value, count)`` pairs for a facet, largest first."""
+    return [
+        (row[0], row[1])
+        for row in conn.execute(
+            "SELECT value, count FROM facet_counts WHERE facet = ? ORDER BY count DESC, value LIMIT ?",
+            (facet, limit)
+        )
+    ]
+
+def read_index_stats(conn) -> Dict[str, Any]:
+    """Build the /api/stats payload from the summary tables."""
+    totals = dict(conn.execute("SELECT key, value FROM index_meta").fetchall())
+    total_workflows = totals.get("total_workflows", 0)
+    total_nodes = totals.get("total_nodes", 0)
+    
+    return {
+        "total_workflows": total_workflows,
+        "total_nodes": total_nodes,
+        "average_nodes_per_workflow": round(total_nodes / total_workflows, 1) if total_workflows else 0,
+        "categories": [{"name": v, "count": c} for v, c in read_facet(conn, "category")],
+        "trigger_types": [{"type": v, "count": c} for v, c in read_facet(conn, "trigger_type")],
+        "complexity_distribution": [
+            {"level": v, "count": c}
+            for v, c in sorted(read_facet(conn, "complexity"))
+        ]
+    }
+
+def migrate_database(conn):
+    """Upgrade an existing database to SCHEMA_VERSION (tracked in PRAGMA user_version)."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    
+    if version < 1:
+        # The original update trigger ran a plain UPDATE against the FTS table
+        # and nothing removed deleted rows, so the index may have drifted.
+        conn.executescript(FTS_TRIGGERS_SQL)
+        conn.execute("INSERT INTO workflows_fts(workflows_fts) VALUES('rebuild')")
+    
+    if version < 2:
+        # Precomputed popularity replaces the LIKE scans over workflow_json
+        add_column(conn, "workflows", "has_ai", "INTEGER")
+        add_column(conn, "workflows", "popularity", "REAL")
+        rows = conn.execute("SELECT id, workflow_json FROM workflows WHERE has_ai IS NULL").fetchall()
+        conn.executemany(
+            "UPDATE workflows SET has_ai = ? WHERE id = ?",
+            [(int(detect_ai_usage(json.loads(row[1] or "{}").get("nodes", []))), row[0]) for row in rows]
+        )
+        recompute_popularity(conn)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_workflows_popularity ON workflows(popularity DESC, id)")
+    
+    if version < 3:
+        # Backfill the normalized service and node type tables
+        conn.execute("""
+            INSERT OR IGNORE INTO workflow_services (workflow_id, service)
+            SELECT workflows.id, json_each.value
+            FROM workflows, json_each(workflows.services)
+            WHERE workflows.services IS NOT NULL
         """)
-        
-        print("\nTrigger Types:")
-        for row in cursor.fetchall():
-            print(f"  {row[0]}: {row[1]}")
-        
-        # Show complexity distribution
-        cursor.execute("""
-            SELECT complexity, COUNT(*) as count 
-            FROM workflows 
-            GROUP BY complexity 
-            ORDER BY 
-                CASE complexity 
-                    WHEN 'simple' THEN 1 
-                    WHEN 'intermediate' THEN 2 
-                    WHEN 'advanced' THEN 3 
-                END
+        for row in conn.execute("SELECT id, workflow_json FROM workflows").fetchall():
+            nodes = json.loads(row[1] or "{}").get("nodes", [])
+            conn.executemany(
+                "INSERT OR REPLACE INTO workflow_node_types (workflow_id, node_type, count) VALUES (?, ?, ?)",
+                [(row[0], node_type, count) for node_type, count in count_node_types(nodes).items()]
+            )
+    
+    if version < 4:
+        conn.executescript(SUMMARY_TRIGGERS_SQL)
+        refresh_summary_tables(conn)
+    
+    if version < 5:
+        # Generation counter behind the read endpoints' ETags, and a covering
+        # index so template ETags never read the workflow_json overflow pages
+        conn.execute("INSERT OR IGNORE INTO index_meta (key, value) VALUES ('generation', 0)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_workflows_file_hash ON workflows(id, file_hash)")
+    
+    if version < 6:
+        # Re-store bodies in the compact response encoding, with statistics
+        # and body_layout so /api/template/{id} can skip reparsing them
+        add_column(conn, "workflows", "statistics", "TEXT")
+        add_column(conn, "workflows", "body_layout", "TEXT")
+        backfill_body_layouts(conn)
+    
+    if version < 7:
+        backfill_signatures(conn)
+    
+    if version < 8:
+        # The popularity scorer briefly lived in the integer index_meta table
+        conn.execute("""
+            INSERT OR IGNORE INTO index_settings (key, value)
+            SELECT key, CAST(value AS TEXT) FROM index_meta WHERE key = 'popularity_scorer'
         """)
-        
-        print("\nComplexity Distribution:")
-        for row in cursor.fetchall():
-            print(f"  {row[0]}: {row[1]}")
-
-# API Endpoints
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database on startup."""
-    init_database()
-    # Auto-populate if database is empty
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM workflows")
-        count = cursor.fetchone()[0]
-        if count == 0:
-            print("Database is empty, auto-populating...")
-            populate_database()
+        conn.execute("DELETE FROM index_meta WHERE key = 'popularity_scorer'")
     
-@app.get("/health")
-async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy", "database": DATABASE_PATH.exists()}
+    if version < SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        commit_generation(conn)
 
-@app.post("/api/search", response_model=List[WorkflowTemplate])
-async def search_templates(request: SearchRequest):
-    """Search workflow templates with FTS5."""
-    with get_db() as conn:
-        # If no search query, return all with filters
-        if not request.query or request.query.strip() == "":
-            query_parts = ["SELECT * FROM workflows WHERE 1=1"]
-            params = []
-        else:
-            # Build FTS5 search query
-            query_parts = ["""
-                SELECT w.* FROM workflows w
-                JOIN workflows_fts fts ON w.id = fts.id
-                WHERE workflows_fts MATCH ?
-            """]
-            params = [request.query]
-        
-        # Add filters
-        if request.category:
-            query_parts.append(" AND w.category = ?" if "w." in query_parts[0] else " AND category = ?")
-            params.append(request.category)
-        if request.trigger_type:
-            query_parts.append(" AND w.trigger_type = ?" if "w." in query_parts[0] else " AND trigger_type = ?")
-            params.append(request.trigger_type)
-            
-        # Add ordering and limit
-        query_parts.append(" ORDER BY nodes_count DESC LIMIT ?")
-        params.append(request.limit)
-        
-        # Execute query
-        query = " ".join(query_parts)
-        cursor = conn.execute(query, params)
-        
-        # Format results
-        results = []
-        for row in cursor:
-            results.append(WorkflowTemplate(
-                id=row["id"],
-                name=row["name"],
-                description=row["description"],
-                category=row["category"],
-                nodes_count=row["nodes_count"],
-                services=json.loads(row["services"]) if row["services"] else [],
-                trigger_type=row["trigger_type"],
-                complexity=row["complexity"],
-                use_cases=json.loads(row["use_cases"]) if row["use_cases"] else []
-            ))
-            
-        return results
+def commit_generation(conn) -> int:
+    """Commit the current write transaction as a new index generation.
 
-@app.get("/api/template/{template_id}", response_model=TemplateMetadata)
-async def get_template_metadata(template_id: str):
-    """Get detailed metadata for a specific template."""
-    with get_db() as conn:
-        cursor = conn.execute(
-            "SELECT * FROM workflows WHERE id = ?",
-            (template_id,)
-        )
-        row = cursor.fetchone()
-        
+    Every commit that changes what the read endpoints return goes through
+    here, so their ETags change with it.
+    """
+    conn.execute("UPDATE index_meta SET value = value + 1 WHERE key = 'generation'")
+    generation = conn.execute("SELECT value FROM index_meta WHERE key = 'generation'").fetchone()[0]
+    conn.commit()
+    index_generation.set(generation)
+    return generation
+
+def backfill_signatures(conn):
+    """Compute MinHash signatures for every stored workflow."""
+    ids = [row[0] for row in conn.execute("SELECT id FROM workflows ORDER BY id")]
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        services = dict(conn.execute(
+            f"SELECT id, services FROM workflows WHERE id IN ({','.join('?' * len(chunk))})", chunk
+        ).fetchall())
+        signatures = []
+        for workflow_id, text in read_workflow_texts(conn, chunk):
+            workflow_json = json.loads(text or "{}")
+            features = structure_features(workflow_json.get("nodes", []), workflow_json.get("connections", {}),
+                                          json.loads(services[workflow_id] or "[]"))
+            signatures.append((workflow_id, minhash_signature(features)))
+        write_signatures(conn, signatures)
+
+def add_column(conn, table: str, column: str, declaration: str):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists."""
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+def recompute_popularity(conn, scorer_name: Optional[str] = None) -> int:
+    """Rescore every workflow from stored columns, without reparsing workflow_json.
+
+    The scorer is recorded in index_settings, so later ingests score new rows
+    on the same scale.
+    """
+    scorer_name = scorer_name or POPULARITY_SCORER
+    scorer = get_popularity_scorer(scorer_name)
+    rows = conn.execute("SELECT id, complexity, has_ai, nodes_count FROM workflows").fetchall()
+    conn.executemany(
+        "UPDATE workflows SET popularity = ? WHERE id = ?",
+        [(scorer(row[1], bool(row[2]), row[3]), row[0]) for row in rows]
+    )
+    conn.execute("INSERT OR REPLACE INTO index_settings (key, value) VALUES ('popularity_scorer', ?)", (scorer_name,))
+    return len(rows)
+
+_scorer_mismatch_warned = False
+
+def stored_popularity_scorer(conn) -> str:
+    """The scorer the stored popularity values were computed with.
+
+    Recorded on first use, so POPULARITY_SCORER only chooses the scorer of
+    a fresh index; switching an existing one goes through
+    --recompute-popularity, which rescores every row.
+    """
+    global _scorer_mismatch_warned
+    row = conn.execute("SELECT value FROM index_settings WHERE key = 'popularity_scorer'").fetchone()
+    if row is None:
+        conn.execute("INSERT INTO index_settings (key, value) VALUES ('popularity_scorer', ?)", (POPULARITY_SCORER,))
+        return POPULARITY_SCORER
+    if row[0] != POPULARITY_SCORER and not _scorer_mismatch_warned:
+        _scorer_mismatch_warned = True
+        print(f"Warning: POPULARITY_SCORER={POPULARITY_SCORER} ignored, the index is scored with '{row[0]}'; "
+              f"run --recompute-popularity --popularity-scorer {POPULARITY_SCORER} to switch")
+    return row[0]
+
+def fts_maintenance(conn, operation: str):
+    """Run an FTS5 maintenance command: rebuild, optimize, merge or integrity-check.
+
+    integrity-check raises sqlite3.DatabaseError if the index does not match
+    the workflows table.
+    """
+    if operation == "integrity-check":
+        # rank=1 also compares the index against the external content table
+        conn.execute("INSERT INTO workflows_fts(workflows_fts, rank) VALUES('integrity-check', 1)")
+    elif operation == "merge":
+        conn.execute("INSERT INTO workflows_fts(workflows_fts, rank) VALUES('merge', ?)", (FTS_MERGE_PAGES,))
+    elif operation in ("rebuild", "optimize"):
+        conn.execute("INSERT INTO workflows_fts(workflows_fts) VALUES(?)", (operation,))
+    else:
+        raise ValueError(f"Unknown FTS maintenance operation: {operation}")
+    conn.commit()
+
+def set_fts_automerge(conn, level: int):
+    conn.execute("INSERT INTO workflows_fts(workflows_fts, rank) VALUES('automerge', ?)", (level,))
+
+def tune_fts_after_load(conn, changed_rows: int, total_rows: int):
+    """Merge FTS segments after a load, in proportion to how much changed.
+
+    Large loads are followed by a full 'optimize' into a single segment;
+    smaller ones get a bounded incremental 'merge'.
+    """
+    if not changed_rows:
+        return
+    if changed_rows >= max(FTS_OPTIMIZE_MIN_ROWS, total_rows // 10):
+        fts_maintenance(conn, "optimize")
+    else:
+        fts_maintenance(conn, "merge")
+
+# Workflow bodies are stored either inline (workflows.workflow_json) or
+# compressed in workflow_bodies. A row's codec is 'zlib' or 'zdict:<id>',
+# where <id> names the preset dictionary in compression_dicts.
+BODY_DICT_FRAGMENT = re.compile(rb'"[^"\\]{1,64}": ?(?:"[^"\\]{0,48}"|-?[0-9.]+|true|false|null|\[|\{)')
+_body_dicts: Dict[str, bytes] = {}
+_ingest_body_codec: Tuple[str, Optional[bytes]] = ("json", None)
+
+def train_body_dictionary(samples: List[bytes], size: int = BODY_DICT_SIZE) -> bytes:
+    """Build a zlib preset dictionary from the JSON fragments most shared across samples.
+
+    Fragments are scored by document frequency times length; the best ones go
+    last, where zlib's back-references to them are shortest.
+    """
+    counts = Counter()
+    for sample in samples:
+        counts.update(set(BODY_DICT_FRAGMENT.findall(sample)))
+    ranked = sorted(counts.items(), key=lambda item: (-item[1] * len(item[0]), item[0]))
+    chosen = []
+    used = 0
+    for fragment, count in ranked:
+        if count < 2 or used + len(fragment) > size:
+            continue
+        chosen.append(fragment)
+        used += len(fragment)
+    return b"".join(reversed(chosen))
+
+def encode_workflow_body(text: str, codec: str, zdict: Optional[bytes] = None) -> bytes:
+    data = text.encode("utf-8")
+    if codec == "zlib":
+        return zlib.compress(data, BODY_ZLIB_LEVEL)
+    if codec.startswith("zdict:"):
+        compressor = zlib.compressobj(BODY_ZLIB_LEVEL, zdict=zdict)
+        return compressor.compress(data) + compressor.flush()
+    raise ValueError(f"Unknown workflow body codec: {codec}")
+
+def load_body_dict(conn, codec: str) -> bytes:
+    """Return the preset dictionary for a 'zdict:<id>' codec (immutable, so cached)."""
+    zdict = _body_dicts.get(codec)
+    if zdict is None:
+        row = conn.execute("SELECT dict FROM compression_dicts WHERE codec = ?", (codec,)).fetchone()
         if not row:
-            raise HTTPException(status_code=404, detail="Template not found")
-            
-        # Parse workflow JSON
-        workflow_json = json.loads(row["workflow_json"])
-        
-        # Extract nodes and connections
-        nodes = workflow_json.get("nodes", [])
-        connections = workflow_json.get("connections", {})
-        
-        # Calculate statistics
-        node_types = {}
-        for node in nodes:
-            node_type = node.get("type", "unknown")
-            node_types[node_type] = node_types.get(node_type, 0) + 1
-            
-        return TemplateMetadata(
-            id=row["id"],
-            name=row["name"],
-            description=row["description"] or "",
-            workflow_json=workflow_json,
-            nodes=nodes,
-            connections=connections,
-            statistics={
-                "total_nodes": len(nodes),
-                "connection_count": sum(len(c) for c in connections.values()),
-                "unique_node_types": len(node_types),
-                **node_types
-            }
-        )
+            raise ValueError(f"Missing compression dictionary {codec}")
+        zdict = _body_dicts[codec] = bytes(row[0])
+    return zdict
 
-@app.get("/api/categories")
-async def list_categories():
-    """List all available categories with counts."""
-    with get_db() as conn:
-        cursor = conn.execute("""
-            SELECT category, COUNT(*) as count 
-            FROM workflows 
-            GROUP BY category 
-            ORDER BY count DESC
-        """)
-        
-        return {
-            "categories": [
-                {"name": row["category"], "count": row["count"]}
-                for row in cursor
-            ]
-        }
+def workflow_body_bytes(conn, inline: Optional[str], codec: Optional[str], body: Optional[bytes]) -> bytes:
+    """Return a workflow's UTF-8 JSON from its inline column or compressed body."""
+    if inline is not None or body is None:
+        return (inline or "{}").encode("utf-8")
+    if codec == "zlib":
+        return zlib.decompress(body)
+    if codec and codec.startswith("zdict:"):
+        decompressor = zlib.decompressobj(zdict=load_body_dict(conn, codec))
+        return decompressor.decompress(body) + decompressor.flush()
+    raise ValueError(f"Unknown workflow body codec: {codec}")
 
-@app.get("/api/triggers")
-async def list_trigger_types():
-    """List all trigger types with counts."""
-    with get_db() as conn:
-        cursor = conn.execute("""
-            SELECT trigger_type, COUNT(*) as count 
-            FROM workflows 
-            WHERE trigger_type IS NOT NULL
-            GROUP BY trigger_type 
-            ORDER BY count DESC
-        """)
-        
-        return {
-            "triggers": [
-                {"type": row["trigger_type"], "count": row["count"]}
-                for row in cursor
-            ]
-        }
+def decode_workflow_body(conn, inline: Optional[str], codec: Optional[str], body: Optional[bytes]) -> str:
+    """Return a workflow's JSON text from its inline column or compressed body."""
+    if inline is not None:
+        return inline
+    return workflow_body_bytes(conn, inline, codec, body).decode("utf-8")
 
-@app.get("/api/services")
-async def list_services():
-    """List all services/integrations with counts."""
-    with get_db() as conn:
-        cursor = conn.execute("""
-            SELECT services 
-            FROM workflows 
-            WHERE services IS NOT NULL AND services != '[]'
-        """)
-        
-        # Count services across all workflows
-        service_counts = {}
-        for row in cursor:
+def store_body_dict(conn, zdict: bytes) -> str:
+    codec = f"zdict:{hashlib.sha1(zdict).hexdigest()[:12]}"
+    conn.execute("INSERT OR IGNORE INTO compression_dicts (codec, dict) VALUES (?, ?)", (codec, zdict))
+    _body_dicts[codec] = zdict
+    return codec
+
+def resolve_body_codec(conn, storage: str = WORKFLOW_STORAGE,
+                       sample_texts=lambda: []) -> Tuple[str, Optional[bytes]]:
+    """Pick the ``(codec, zdict)`` new rows are written with for a storage mode.
+
+    zlib-dict reuses the most recent dictionary, training one from
+    ``sample_texts()`` the first time.
+    """
+    if storage not in WORKFLOW_STORAGE_MODES:
+        raise ValueError(f"WORKFLOW_STORAGE must be one of {', '.join(WORKFLOW_STORAGE_MODES)}")
+    if storage != "zlib-dict":
+        return storage, None
+    row = conn.execute("SELECT codec, dict FROM compression_dicts ORDER BY rowid DESC LIMIT 1").fetchone()
+    if row:
+        return row[0], bytes(row[1])
+    zdict = train_body_dictionary([text.encode("utf-8") for text in sample_texts()])
+    if not zdict:
+        return "zlib", None
+    return store_body_dict(conn, zdict), zdict
+
+def sample_template_texts(paths: List[str]) -> List[str]:
+    """Serialize an evenly spaced sample of template files as they would be stored."""
+    step = max(1, len(paths) // BODY_DICT_SAMPLES)
+    texts = []
+    for path in sorted(paths)[::step]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                texts.append(json.dumps(json.loads(f.read())))
+        except Exception:
+            continue
+    return texts
+
+def set_ingest_body_codec(codec: str, zdict: Optional[bytes]):
+    """Select the codec process_template_file compresses bodies with (per process)."""
+    global _ingest_body_codec
+    _ingest_body_codec = (codec, zdict)
+
+def compact_json(value: Any) -> bytes:
+    """Encode JSON exactly as FastAPI encodes response models (pydantic-core, NaN as null)."""
+    return to_json(value, inf_nan_mode="null")
+
+def prepare_workflow_body(workflow_json: Any) -> Tuple[str, Optional[str], Optional[str]]:
+    """Serialize a workflow for storage and precompute what its template response needs.
+
+    The text uses the same compact encoding as API responses. Returns
+    ``(text, statistics, body_layout)``, where body_layout holds the byte
+    spans of the top-level "nodes" and "connections" values (null when
+    absent). Both are None if the workflow can't be served from fragments,
+    and the endpoint then falls back to parsing it.
+    """
+    if not isinstance(workflow_json, dict):
+        return compact_json(workflow_json).decode("utf-8"), None, None
+    
+    pieces = [b"{"]
+    spans = {}
+    offset = 1
+    for key, value in workflow_json.items():
+        prefix = (b"," if offset > 1 else b"") + compact_json(key) + b":"
+        encoded = compact_json(value)
+        offset += len(prefix)
+        spans[key] = [offset, offset + len(encoded)]
+        offset += len(encoded)
+        pieces += [prefix, encoded]
+    pieces.append(b"}")
+    text = b"".join(pieces).decode("utf-8")
+    
+    nodes = workflow_json.get("nodes", [])
+    connections = workflow_json.get("connections", {})
+    try:
+        if not isinstance(connections, dict) or not all(isinstance(node, dict) for node in nodes):
+            raise TypeError("unexpected nodes or connections shape")
+        statistics = compact_json(template_statistics(nodes, connections)).decode("utf-8")
+    except TypeError:
+        return text, None, None
+    layout = spans.get("nodes", [None, None]) + spans.get("connections", [None, None])
+    return text, statistics, json.dumps(layout)
+
+def backfill_body_layouts(conn):
+    """Re-encode stored bodies that predate body_layout, keeping their storage codec."""
+    ids = [row[0] for row in conn.execute("SELECT id FROM workflows WHERE body_layout IS NULL")]
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        rows = conn.execute(f"""
+            SELECT w.id, w.workflow_json, b.codec, b.body FROM workflows w
+            LEFT JOIN workflow_bodies b ON b.workflow_id = w.id
+            WHERE w.id IN ({','.join('?' * len(chunk))})
+        """, chunk).fetchall()
+        for workflow_id, inline, codec, body in rows:
             try:
-                services = json.loads(row["services"])
-                for service in services:
-                    service_counts[service] = service_counts.get(service, 0) + 1
-            except:
+                workflow_json = json.loads(decode_workflow_body(conn, inline, codec, body))
+            except ValueError:
                 continue
+            text, statistics, layout = prepare_workflow_body(workflow_json)
+            if body is not None:
+                zdict = load_body_dict(conn, codec) if codec.startswith("zdict:") else None
+                conn.execute("UPDATE workflow_bodies SET body = ? WHERE workflow_id = ?",
+                             (encode_workflow_body(text, codec, zdict), workflow_id))
+                text = None
+            conn.execute(
+                "UPDATE workflows SET workflow_json = ?, statistics = ?, body_layout = ? WHERE id = ?",
+                (text, statistics, layout, workflow_id)
+            )
+
+def process_template_file(task):
+    """Read, hash and extract metadata for one template file.
+
+    Runs inside ingestion worker processes, so it only takes and returns
+    picklable values. Returns a ``(status, path, payload)`` tuple where status
+    is ``"ok"`` (payload is the row dict), ``"skipped"`` (payload is the
+    unchanged file hash) or ``"error"``.
+    """
+    path, known_hash, force_reindex, popularity_scorer = task
+    try:
+        # Read file
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
         
-        # Sort by count
-        sorted_services = sorted(service_counts.items(), key=lambda x: x[1], reverse=True)
+        # Calculate file hash
+        file_hash = hashlib.md5(content.encode()).hexdigest()
+        if known_hash == file_hash and not force_reindex:
+            return ("skipped", path, file_hash)
         
-        return {
-            "services": [
-                {"name": service, "count": count}
-                for service, count in sorted_services[:50]  # Top 50 services
-            ],
-            "total_unique_services": len(service_counts)
-        }
-
-@app.get("/api/stats")
-async def get_database_stats():
-    """Get comprehensive database statistics."""
-    with get_db() as conn:
+        workflow_json = json.loads(content)
+        metadata = extract_workflow_metadata(workflow_json, path, popularity_scorer)
+        workflow_text, statistics, body_layout = prepare_workflow_body(workflow_json)
+        codec, zdict = _ingest_body_codec
+        body = None if codec == "json" else encode_workflow_body(workflow_text, codec, zdict)
+        
+        return ("ok", path, {
+            "id": Path(path).stem,
+            "name": metadata["name"],
+            "description": metadata["description"],
+            "category": metadata["category"],
+            "nodes_count": metadata["nodes_count"],
+            "services": json.dumps(metadata["services"]),
+            "trigger_type": metadata["trigger_type"],
+            "complexity": metadata["complexity"],
+            "use_cases": json.dumps(metadata["use_cases"]),
+            "workflow_json": workflow_text if body is None else None,
+            "body_codec": codec,
+            "body": body,
+            "statistics": statistics,
+            "body_layout": body_layout,
+            "file_hash": file_hash,
+            "has_ai": int(metadata["has_ai"]),
+            "popularity": metadata["popularity"],
+            "node_types": count_node_types(workflow_json.get("nodes", [])),
+            "signature": minhash_signature(structure_features(
+                workflow_json.get("nodes", []), workflow_json.get("connections", {}), metadata["services"]
+            )),
+        })
+    except Exception as e:
+        return ("error", path, str(e))
+
+UPSERT_WORKFLOW_SQL = """
+    INSERT INTO workflows 
+    (id, name, description, category, nodes_count, services, 
+     trigger_type, complexity, use_cases, workflow_json, file_hash,
+     has_ai, popularity, statistics, body_layout)
+    VALUES (:id, :name, :description, :category, :nodes_count, :services,
+            :trigger_type, :complexity, :use_cases, :workflow_json, :file_hash,
+            :has_ai, :popularity, :statistics, :body_layout)
+    ON CONFLICT(id) DO UPDATE SET
+        name=excluded.name, description=excluded.description,
+        category=excluded.category, nodes_count=excluded.nodes_count,
+        services=excluded.services, trigger_type=excluded.trigger_type,
+        complexity=excluded.complexity, use_cases=excluded.use_cases,
+        workflow_json=excluded.workflow_json, file_hash=excluded.file_hash,
+        has_ai=excluded.has_ai, popularity=excluded.popularity,
+        statistics=excluded.statistics, body_layout=excluded.body_layout,
+        updated_at=CURRENT_TIMESTAMP
+"""
+
+def iter_processed_templates(tasks: List[tuple], workers: int, body_codec=("json", None)):
+    """Yield process_template_file results, fanning out over a process pool."""
+    if workers <= 1 or len(tasks) < INGEST_MIN_PARALLEL_FILES:
+        set_ingest_body_codec(*body_codec)
+        yield from map(process_template_file, tasks)
+        return
+    
+    chunksize = max(1, min(64, len(tasks) // (workers * 8)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=set_ingest_body_codec,
+                             initargs=body_codec) as executor:
+        yield from executor.map(process_template_file, tasks, chunksize=chunksize)
+
+UPSERT_MANIFEST_SQL = """
+    INSERT OR REPLACE INTO template_manifest (path, workflow_id, size, mtime_ns, file_hash)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+def scan_templates(conn, templates_dir: Path, force_reindex=False):
+    """Compare the templates directory against the stored manifest.
+
+    Only ``stat`` is used here: files whose size and mtime match the
+    manifest are counted as unchanged without being opened.
+
+    Returns ``(changed, unchanged, deleted_ids)`` where ``changed`` maps each
+    file path that needs processing to its ``(size, mtime_ns)``.
+    """
+    manifest = {
+        row[0]: (row[1], row[2])
+        for row in conn.execute("SELECT path, size, mtime_ns FROM template_manifest")
+    }
+    
+    changed = {}
+    unchanged = 0
+    seen_ids = set()
+    with os.scandir(templates_dir) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".json") or not entry.is_file():
+                continue
+            stat = entry.stat()
+            seen_ids.add(Path(entry.name).stem)
+            if not force_reindex and manifest.get(entry.name) == (stat.st_size, stat.st_mtime_ns):
+                unchanged += 1
+                continue
+            changed[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    
+    existing_ids = {row[0] for row in conn.execute("SELECT id FROM workflows")}
+    deleted_ids = sorted(existing_ids - seen_ids)
+    
+    return changed, unchanged, deleted_ids
+
+def purge_workflows(conn, workflow_ids: List[str]):
+    """Delete workflows and their FTS entries and manifest rows."""
+    params = [(workflow_id,) for workflow_id in workflow_ids]
+    # workflows_ad removes the FTS entries
+    conn.executemany("DELETE FROM workflows WHERE id = ?", params)
+    conn.executemany("DELETE FROM workflow_services WHERE workflow_id = ?", params)
+    conn.executemany("DELETE FROM workflow_node_types WHERE workflow_id = ?", params)
+    conn.executemany("DELETE FROM workflow_bodies WHERE workflow_id = ?", params)
+    conn.executemany("DELETE FROM template_manifest WHERE workflow_id = ?", params)
+    write_signatures(conn, [(workflow_id, None) for workflow_id in workflow_ids])
+
+def read_workflow_texts(conn, workflow_ids: List[str]) -> List[tuple]:
+    """Return ``(id, workflow JSON text)`` for the given workflows, whatever their storage."""
+    rows = conn.execute(f"""
+        SELECT w.id, w.workflow_json, b.codec, b.body FROM workflows w
+        LEFT JOIN workflow_bodies b ON b.workflow_id = w.id
+        WHERE w.id IN ({','.join('?' * len(workflow_ids))})
+    """, workflow_ids).fetchall()
+    return [(row[0], decode_workflow_body(conn, row[1], row[2], row[3])) for row in rows]
+
+def migrate_storage(conn, storage: str) -> int:
+    """Re-encode every stored workflow body for a WORKFLOW_STORAGE mode.
+
+    zlib-dict trains a fresh dictionary from the stored bodies; dictionaries
+    no longer referenced are dropped. The caller owns the transaction.
+    Returns the number of workflows converted.
+    """
+    ids = [row[0] for row in conn.execute("SELECT id FROM workflows ORDER BY id")]
+    chunks = [ids[i:i + 500] for i in range(0, len(ids), 500)]
+    
+    def sample_texts():
+        sample = ids[::max(1, len(ids) // BODY_DICT_SAMPLES)]
+        return [text for i in range(0, len(sample), 500)
+                for _, text in read_workflow_texts(conn, sample[i:i + 500])]
+    
+    if storage == "zlib-dict":
+        # Always retrain: the stored bodies are the best sample there is
+        zdict = train_body_dictionary([text.encode("utf-8") for text in sample_texts()])
+        codec = store_body_dict(conn, zdict) if zdict else "zlib"
+    else:
+        codec, zdict = resolve_body_codec(conn, storage)
+    
+    for chunk in chunks:
+        rows = read_workflow_texts(conn, chunk)
+        if codec == "json":
+            conn.executemany("UPDATE workflows SET workflow_json = ? WHERE id = ?",
+                             [(text, workflow_id) for workflow_id, text in rows])
+            conn.executemany("DELETE FROM workflow_bodies WHERE workflow_id = ?",
+                             [(workflow_id,) for workflow_id, _ in rows])
+        else:
+            conn.executemany(
+                "INSERT OR REPLACE INTO workflow_bodies (workflow_id, codec, body) VALUES (?, ?, ?)",
+                [(workflow_id, codec, encode_workflow_body(text, codec, zdict)) for workflow_id, text in rows]
+            )
+            conn.executemany("UPDATE workflows SET workflow_json = NULL WHERE id = ?",
+                             [(workflow_id,) for workflow_id, _ in rows])
+    
+    conn.execute("DELETE FROM compression_dicts WHERE codec NOT IN (SELECT codec FROM workflow_bodies)")
+    return len(ids)
+
+def database_size(conn) -> int:
+    """Bytes used by the database file's pages."""
+    return conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+
+def write_batch(conn, records: List[Dict[str, Any]], manifest_rows: List[tuple]):
+    """Write one batch of processed templates and their derived rows."""
+    if records:
+        conn.executemany(UPSERT_WORKFLOW_SQL, records)
+        
+        ids = [(record["id"],) for record in records]
+        conn.executemany("DELETE FROM workflow_bodies WHERE workflow_id = ?", ids)
+        conn.executemany(
+            "INSERT INTO workflow_bodies (workflow_id, codec, body) VALUES (?, ?, ?)",
+            [(record["id"], record["body_codec"], record["body"]) for record in records if record["body"] is not None]
+        )
+        conn.executemany("DELETE FROM workflow_services WHERE workflow_id = ?", ids)
+        conn.executemany("DELETE FROM workflow_node_types WHERE workflow_id = ?", ids)
+        conn.executemany(
+            "INSERT OR IGNORE INTO workflow_services (workflow_id, service) VALUES (?, ?)",
+            [(record["id"], service) for record in records for service in json.loads(record["services"])]
+        )
+        conn.executemany(
+            "INSERT INTO workflow_node_types (workflow_id, node_type, count) VALUES (?, ?, ?)",
+            [(record["id"], node_type, count)
+             for record in records for node_type, count in record["node_types"].items()]
+        )
+        write_signatures(conn, [(record["id"], record["signature"]) for record in records])
+    if manifest_rows:
+        conn.executemany(UPSERT_MANIFEST_SQL, manifest_rows)
+
+def ingest_templates(conn, changed: Dict[str, tuple], force_reindex=False,
+                     workers: int = 1, batch_size: int = INGEST_BATCH_SIZE) -> Dict[str, int]:
+    """Parse changed template files and upsert them in ``executemany`` batches.
+
+    The caller owns the transaction. Returns imported/updated/skipped/error counts.
+    """
+    counts = {"imported": 0, "updated": 0, "skipped": 0, "errors": 0}
+    
+    # Only the changed files need their previous hash, so look those up by key
+    # instead of scanning file_hash (stored after the large workflow_json column).
+    stems = {path: Path(path).stem for path in changed}
+    known_hashes = {}
+    stem_list = list(set(stems.values()))
+    for i in range(0, len(stem_list), 500):
+        chunk = stem_list[i:i + 500]
+        known_hashes.update(conn.execute(
+            f"SELECT id, file_hash FROM workflows WHERE id IN ({','.join('?' * len(chunk))})",
+            chunk
+        ))
+    
+    popularity_scorer = stored_popularity_scorer(conn)
+    get_popularity_scorer(popularity_scorer)  # fail before starting workers if it no longer resolves
+    tasks = [(path, known_hashes.get(stems[path]), force_reindex, popularity_scorer) for path in changed]
+    body_codec = resolve_body_codec(conn, sample_texts=lambda: sample_template_texts(list(changed)))
+    
+    batch = []
+    manifest_batch = []
+    for status, path, payload in iter_processed_templates(tasks, workers, body_codec):
+        if status == "error":
+            counts["errors"] += 1
+            print(f"Error processing {path}: {payload}")
+            continue
+        
+        size, mtime_ns = changed[path]
+        if status == "skipped":
+            counts["skipped"] += 1
+            manifest_batch.append((Path(path).name, stems[path], size, mtime_ns, payload))
+            continue
+        
+        if payload["id"] in known_hashes:
+            counts["updated"] += 1
+        else:
+            counts["imported"] += 1
+        batch.append(payload)
+        manifest_batch.append((Path(path).name, payload["id"], size, mtime_ns, payload["file_hash"]))
+        
+        if len(batch) >= batch_size:
+            write_batch(conn, batch, manifest_batch)
+            batch = []
+            manifest_batch = []
+    
+    if batch or manifest_batch:
+        write_batch(conn, batch, manifest_batch)
+    
+    return counts
+
+# Vector index: LSA embeddings of name, description, services and node types
+VECTOR_TOKEN = re.compile(r"[a-z0-9]+")
+VECTOR_CAMEL_CASE = re.compile(r"([a-z])([A-Z])")
+VECTOR_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in into is it its of on or that the this to was "
+    "when will with you your n8n".split()
+)
+
+def stem_term(term: str) -> str:
+    """Crude suffix stripping, so that e.g. invoice/invoices/invoiced share a term."""
+    for suffix in ("ifications", "ification", "ifying", "ified", "ifies"):
+        if term.endswith(suffix):
+            return term[:-len(suffix)] + "ify"
+    if term.endswith("ies") and len(term) > 4:
+        return term[:-3] + "y"
+    if term.endswith(("sses", "xes", "zes", "ches", "shes")):
+        return term[:-2]
+    for suffix in ("ing", "ed", "s"):
+        if term.endswith(suffix) and not term.endswith("ss") and len(term) - len(suffix) >= 3:
+            term = term[:-len(suffix)]
+            break
+    return term[:-1] if term.endswith("e") and len(term) > 4 else term
+
+def vector_terms(text: Optional[str]) -> List[str]:
+    """Terms of a document or query for the vector index."""
+    text = VECTOR_CAMEL_CASE.sub(r"\1 \2", text or "").lower()
+    return [stem_term(token) for token in VECTOR_TOKEN.findall(text)
+            if len(token) > 1 and token not in VECTOR_STOPWORDS]
+
+def vector_documents(conn) -> Tuple[List[int], List[Counter]]:
+    """Term counts per workflow, in rowid order; the name counts twice."""
+    rows = conn.execute("""
+        SELECT w.rowid, w.name, w.description, w.services, w.use_cases,
+               (SELECT group_concat(node_type, ' ') FROM workflow_node_types t
+                WHERE t.workflow_id = w.id) AS node_types
+        FROM workflows w ORDER BY w.rowid
+    """)
+    rowids, documents = [], []
+    for row in rows:
+        # "n8n-nodes-base.googleSheets" -> "googleSheets"
+        node_types = " ".join(node_type.rsplit(".", 1)[-1] for node_type in (row["node_types"] or "").split())
+        text = " ".join([row["name"], row["name"], row["description"] or "", row["services"] or "",
+                         row["use_cases"] or "", node_types])
+        rowids.append(row["rowid"])
+        documents.append(Counter(vector_terms(text)))
+    return rowids, documents
+
+def tfidf_chunks(indptr, indices, data, terms: int, chunk: int = 1024):
+    """Yield (start, stop, dense rows) of a CSR matrix, a chunk of rows at a time."""
+    rows = len(indptr) - 1
+    for start in range(0, rows, chunk):
+        stop = min(start + chunk, rows)
+        dense = np.zeros((stop - start, terms), dtype=np.float32)
+        lo, hi = indptr[start], indptr[stop]
+        row_numbers = np.repeat(np.arange(stop - start), np.diff(indptr[start:stop + 1]))
+        dense[row_numbers, indices[lo:hi]] = data[lo:hi]
+        yield start, stop, dense
+
+def lsa_components(indptr, indices, data, shape: Tuple[int, int], k: int, iterations: int = 2) -> "np.ndarray":
+    """Top-``k`` right singular vectors of a TF-IDF matrix (randomized SVD).
+
+    The matrix is only ever densified a chunk of rows at a time.
+    """
+    rows, terms = shape
+    
+    def times(m):  # A @ m
+        out = np.empty((rows, m.shape[1]), dtype=np.float32)
+        for start, stop, dense in tfidf_chunks(indptr, indices, data, terms):
+            out[start:stop] = dense @ m
+        return out
+    
+    def transpose_times(m):  # A.T @ m
+        out = np.zeros((terms, m.shape[1]), dtype=np.float32)
+        for start, stop, dense in tfidf_chunks(indptr, indices, data, terms):
+            out += dense.T @ m[start:stop]
+        return out
+    
+    rng = np.random.default_rng(0)
+    sketch = times(rng.standard_normal((terms, min(k + 10, terms)), dtype=np.float32))
+    for _ in range(iterations):
+        q, _ = np.linalg.qr(sketch)
+        q, _ = np.linalg.qr(transpose_times(q))
+        sketch = times(q)
+    q, _ = np.linalg.qr(sketch)
+    _, _, vt = np.linalg.svd(transpose_times(q).T, full_matrices=False)
+    return np.ascontiguousarray(vt[:k], dtype=np.float32)
+
+def normalize_rows(matrix: "np.ndarray") -> "np.ndarray":
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1)
+
+class VectorIndexBuild:
+    """One loaded vector index build: vocabulary, projection and vectors."""
+
+    def __init__(self, meta, vectors):
+        self.build = str(meta["build"])
+        self.generation = int(meta["generation"])
+        self.rowids = meta["rowids"]
+        self.terms = {term: i for i, term in enumerate(meta["vocab"].tolist())}
+        self.idf = meta["idf"]
+        self.components = meta["components"]
+        self.vectors = vectors  # memory-mapped, one unit row per workflow
+
+    def embed(self, text: str) -> Optional["np.ndarray"]:
+        """Project a query into the LSA space; None if it has no known terms."""
+        counts = Counter(term for term in vector_terms(text) if term in self.terms)
+        if not counts:
+            return None
+        columns = np.fromiter((self.terms[term] for term in counts), dtype=np.int64, count=len(counts))
+        weights = np.fromiter((1 + math.log(count) for count in counts.values()), dtype=np.float32, count=len(counts))
+        vector = self.components[:, columns] @ (weights * self.idf[columns])
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def top(self, vector: "np.ndarray", depth: int, allowed: Optional["np.ndarray"] = None) -> List[Tuple[int, float]]:
+        """The ``depth`` nearest workflows as (rowid, cosine), best first."""
+        scores = self.vectors @ vector
+        if allowed is not None:
+            scores = np.where(np.isin(self.rowids, allowed), scores, -np.inf)
+        depth = min(depth, len(scores))
+        if not depth:
+            return []
+        top = np.argpartition(-scores, depth - 1)[:depth]
+        top = top[np.lexsort((self.rowids[top], -scores[top]))]
+        return [(int(self.rowids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+class VectorIndex:
+    """The on-disk vector index, reloaded whenever a rebuild replaces it.
+
+    VECTOR_INDEX_PATH (.npz) holds the vocabulary, idf weights and LSA
+    projection and names the build's .npy vector matrix, which is opened
+    memory-mapped. Rebuilds write a new .npy before swapping the .npz, so a
+    reader always sees one consistent build.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.loaded: Optional[VectorIndexBuild] = None
+        self.mtime_ns: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[VectorIndexBuild]:
+        if np is None or VECTOR_INDEX == "off":
+            return None
+        try:
+            mtime_ns = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime_ns != self.mtime_ns:
+            with self._lock:
+                if mtime_ns != self.mtime_ns:
+                    with np.load(self.path) as meta:
+                        vectors = np.load(self.path.with_name(str(meta["vectors_file"])), mmap_mode="r")
+                        self.loaded = VectorIndexBuild(meta, vectors)
+                    self.mtime_ns = mtime_ns
+        return self.loaded
+
+    def status(self) -> Dict[str, Any]:
+        if np is None or VECTOR_INDEX == "off":
+            return {"available": False, "reason": "numpy not installed" if np is None else "VECTOR_INDEX=off"}
+        loaded = self.current()
+        if loaded is None:
+            return {"available": False, "reason": "not built"}
+        return {
+            "available": True,
+            "templates": len(loaded.rowids),
+            "dimensions": loaded.components.shape[0],
+            "terms": len(loaded.terms),
+            "generation": loaded.generation,
+        }
+
+vector_index = VectorIndex(VECTOR_INDEX_PATH)
+
+def build_vector_index(conn, path: Path = VECTOR_INDEX_PATH, dimensions: int = VECTOR_DIMENSIONS) -> int:
+    """Compute LSA vectors for every workflow and atomically replace the index files.
+
+    Returns the number of workflows indexed.
+    """
+    generation_row = conn.execute("SELECT value FROM index_meta WHERE key = 'generation'").fetchone()
+    rowids, documents = vector_documents(conn)
+    document_frequency = Counter(term for counts in documents for term in counts)
+    min_df = 2 if len(documents) >= 50 else 1
+    vocab = sorted(
+        (term for term, df in document_frequency.items() if df >= min_df),
+        key=lambda term: (-document_frequency[term], term)
+    )[:VECTOR_MAX_TERMS]
+    if len(rowids) < 2 or len(vocab) < 2:
+        return 0
+    
+    columns = {term: i for i, term in enumerate(vocab)}
+    idf = np.log((1 + len(documents)) / (1 + np.array([document_frequency[t] for t in vocab], dtype=np.float32))) + 1
+    indptr, indices, data = [0], [], []
+    for counts in documents:
+        row = [(columns[term], 1 + math.log(count)) for term, count in counts.items() if term in columns]
+        norm = math.sqrt(sum((weight * idf[column]) ** 2 for column, weight in row)) or 1.0
+        indices += [column for column, _ in row]
+        data += [weight * idf[column] / norm for column, weight in row]
+        indptr.append(len(indices))
+    indptr = np.array(indptr, dtype=np.int64)
+    indices = np.array(indices, dtype=np.int64)
+    data = np.array(data, dtype=np.float32)
+    shape = (len(rowids), len(vocab))
+    
+    k = max(1, min(dimensions, *shape))
+    components = lsa_components(indptr, indices, data, shape, k)
+    vectors = np.empty((len(rowids), k), dtype=np.float32)
+    for start, stop, dense in tfidf_chunks(indptr, indices, data, len(vocab)):
+        vectors[start:stop] = normalize_rows(dense @ components.T)
+    
+    generation = generation_row[0] if generation_row else 0
+    build = f"{generation}-{os.urandom(4).hex()}"
+    vectors_file = f"{path.stem}-{build}.npy"
+    np.save(path.with_name(vectors_file), vectors)
+    temporary = path.with_name(path.name + ".tmp")
+    with open(temporary, "wb") as f:
+        np.savez(
+            f, build=build, generation=generation, vectors_file=vectors_file,
+            rowids=np.array(rowids, dtype=np.int64), vocab=np.array(vocab), idf=idf.astype(np.float32),
+            components=components
+        )
+    os.replace(temporary, path)
+    # Readers of older builds keep their memory maps after the unlink
+    for old in path.parent.glob(f"{path.stem}-*.npy"):
+        if old.name != vectors_file:
+            old.unlink(missing_ok=True)
+    return len(rowids)
+
+_vector_build_lock = threading.Lock()
+
+def refresh_vector_index(conn, force: bool = False) -> Optional[int]:
+    """Rebuild the vector index if it is missing or behind the index generation.
+
+    The build only reads, so ``conn`` can be a pooled read connection.
+    Returns the number of workflows indexed, or None when nothing was built
+    (vectors disabled, numpy missing or the index already current).
+    """
+    if np is None or VECTOR_INDEX == "off":
+        return None
+    # Concurrent builds would race on the .npz temporary file
+    with _vector_build_lock:
+        if not force:
+            loaded = vector_index.current()
+            row = conn.execute("SELECT value FROM index_meta WHERE key = 'generation'").fetchone()
+            if loaded is not None and loaded.generation == (row[0] if row else 0):
+                return None
+        started = time.perf_counter()
+        count = build_vector_index(conn)
+        print(f"Vector index: {count} workflows in {time.perf_counter() - started:.2f}s")
+        return count
+
+class VectorIndexRefresher:
+    """Rebuilds the vector index on a background thread after index changes.
+
+    Requests made within VECTOR_REBUILD_DELAY, or while a build runs, are
+    folded into one rebuild. Builds read through the read pool, so the
+    writer is never held, and searches keep using the previous build until
+    the new .npz replaces it.
+    """
+
+    def __init__(self, delay: float = VECTOR_REBUILD_DELAY):
+        self.delay = delay
+        self.requested = False
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def request(self):
+        if np is None or VECTOR_INDEX == "off":
+            return
+        with self._lock:
+            self.requested = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="vector-index", daemon=True)
+                self._thread.start()
+
+    def pending(self) -> bool:
+        with self._lock:
+            return self._thread is not None
+
+    def _run(self):
+        while True:
+            time.sleep(self.delay)
+            with self._lock:
+                self.requested = False
+            try:
+                with get_db() as conn:
+                    refresh_vector_index(conn)
+                self.last_error = None
+            except Exception as e:
+                print(f"Vector index rebuild failed: {e}")
+                self.last_error = str(e)
+            with self._lock:
+                if not self.requested:
+                    self._thread = None
+                    return
+
+vector_refresher = VectorIndexRefresher()
+
+def populate_database(force_reindex=False, workers: Optional[int] = None, batch_size: Optional[int] = None):
+    """Populate database with workflow templates from templates directory.
+
+    Unchanged files are detected from the stored manifest (size and mtime),
+    changed files are parsed across ``workers`` processes and written back in
+    ``executemany`` batches of ``batch_size`` rows inside one transaction, and
+    rows for files that no longer exist are purged.
+    """
+    templates_dir = Path(os.getenv("TEMPLATES_DIR", "./templates"))
+    workers = workers or INGEST_WORKERS or os.cpu_count() or 1
+    batch_size = max(1, batch_size or INGEST_BATCH_SIZE)
+    
+    if not templates_dir.exists():
+        print(f"Creating templates directory: {templates_dir}")
+        templates_dir.mkdir(parents=True, exist_ok=True)
+        return
+    
+    with get_write_db() as conn:
         cursor = conn.cursor()
+        started = time.perf_counter()
+        
+        changed, unchanged, deleted_ids = scan_templates(conn, templates_dir, force_reindex)
+        total_files = len(changed) + unchanged
+        print(f"Found {total_files} workflow files ({len(changed)} new or modified)")
+        
+        # Still purge rows whose files were all removed
+        if not total_files and not deleted_ids:
+            print(f"No workflow files found in {templates_dir}, nothing to index.")
+            return
+        
+        # Defer FTS segment merges during large loads; one merge at the end is cheaper
+        bulk_load = len(changed) >= FTS_OPTIMIZE_MIN_ROWS
+        if bulk_load:
+            set_fts_automerge(conn, 0)
+        try:
+            counts = ingest_templates(conn, changed, force_reindex, workers, batch_size)
+            if deleted_ids:
+                purge_workflows(conn, deleted_ids)
+        finally:
+            if bulk_load:
+                set_fts_automerge(conn, FTS_AUTOMERGE)
+        
+        changed_rows = counts["imported"] + counts["updated"] + len(deleted_ids)
+        if changed_rows:
+            commit_generation(conn)
+        else:
+            conn.commit()
+        tune_fts_after_load(conn, changed_rows, total_files)
+        refresh_vector_index(conn)
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        
+        # Print statistics
+        stats = read_index_stats(conn)
+        
+        print(f"\nDatabase population complete:")
+        print(f"  Total workflows: {stats['total_workflows']}")
+        print(f"  Imported: {counts['imported']}")
+        print(f"  Updated: {counts['updated']}")
+        print(f"  Skipped: {unchanged + counts['skipped']}")
+        print(f"  Deleted: {len(deleted_ids)}")
+        print(f"  Errors: {counts['errors']}")
+        print(f"  Throughput: {total_files / elapsed:.1f} files/sec "
+              f"({elapsed:.2f}s, {workers} workers, batch size {batch_size})")
+        
+        print("\nCategories:")
+        for item in stats["categories"]:
+            print(f"  {item['name']}: {item['count']}")
+        
+        print("\nTrigger Types:")
+        for item in stats["trigger_types"]:
+            print(f"  {item['type']}: {item['count']}")
+        
+        print("\nComplexity Distribution:")
+        for item in sorted(stats["complexity_distribution"], key=lambda c: COMPLEXITY_RANK.get(c["level"], 0)):
+            print(f"  {item['level']}: {item['count']}")
+
+# Template directory watcher
+class InotifyWatch:
+    """Minimal inotify binding (Linux only) for a single directory."""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    
+    WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+                  IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, directory: Path):
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise OSError("libc not found")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available on this platform")
+        
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(str(directory)), self.WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def read(self, timeout: float):
+        """Wait up to ``timeout`` seconds and return ``(names, needs_rescan)``."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], False
+        
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return [], False
+        
+        names = []
+        needs_rescan = False
+        offset = 0
+        while offset + self.EVENT_HEADER.size <= len(data):
+            _, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            offset += length
+            if mask & (self.IN_Q_OVERFLOW | self.IN_DELETE_SELF | self.IN_MOVE_SELF | self.IN_IGNORED):
+                needs_rescan = True
+            elif name:
+                names.append(name)
+        return names, needs_rescan
+
+    def close(self):
+        os.close(self.fd)
+
+class TemplateWatcher:
+    """Background thread that keeps the index in sync with TEMPLATES_DIR.
+
+    Uses inotify where available and falls back to periodic stat scans.
+    Bursts of events are debounced, then only the affected files are
+    re-indexed in small transactions so readers never wait on a long write.
+    """
+
+    def __init__(self, templates_dir: Path, mode: str = "auto",
+                 debounce: float = 1.0, poll_interval: float = 5.0):
+        self.templates_dir = templates_dir
+        self.requested_mode = mode
+        self.mode = None
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.pending: Dict[str, float] = {}
+        self.in_flight: Dict[str, float] = {}
+        self.rescan_requested_at: Optional[float] = None
+        self.rescan_in_flight_at: Optional[float] = None
+        self.last_event_at: Optional[float] = None
+        self.last_sync_at: Optional[float] = None
+        self.files_indexed = 0
+        self.files_deleted = 0
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="template-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        """Report how far the index is behind the templates directory."""
+        now = time.time()
+        with self._lock:
+            waiting = list(self.pending.values()) + list(self.in_flight.values())
+            for requested_at in (self.rescan_requested_at, self.rescan_in_flight_at):
+                if requested_at is not None:
+                    waiting.append(requested_at)
+            oldest = min(waiting, default=None)
+            return {
+                "enabled": True,
+                "mode": self.mode,
+                "pending_files": len(self.pending) + len(self.in_flight),
+                "rescan_pending": (self.rescan_requested_at is not None or
+                                   self.rescan_in_flight_at is not None),
+                "lag_seconds": round(now - oldest, 3) if oldest is not None else 0.0,
+                "last_sync_at": self.last_sync_at,
+                "files_indexed": self.files_indexed,
+                "files_deleted": self.files_deleted,
+                "last_error": self.last_error,
+            }
+
+    def _run(self):
+        inotify = None
+        if self.requested_mode in ("auto", "inotify"):
+            try:
+                inotify = InotifyWatch(self.templates_dir)
+            except OSError as e:
+                print(f"Warning: inotify unavailable ({e}), polling {self.templates_dir} instead")
+        self.mode = "inotify" if inotify else "poll"
+        
+        # Catch up on anything that changed while the server was down
+        self._request_rescan()
+        try:
+            while not self._stop.is_set():
+                if inotify:
+                    names, needs_rescan = inotify.read(min(self.debounce, 0.5))
+                    now = time.time()
+                    with self._lock:
+                        for name in names:
+                            if name.endswith(".json"):
+                                self.pending.setdefault(name, now)
+                                self.last_event_at = now
+                    if needs_rescan:
+                        self._request_rescan()
+                else:
+                    if self._stop.wait(self.poll_interval):
+                        break
+                    self._request_rescan()
+                
+                if self._is_settled():
+                    self._flush()
+        finally:
+            if inotify:
+                inotify.close()
+
+    def _request_rescan(self):
+        with self._lock:
+            if self.rescan_requested_at is None:
+                self.rescan_requested_at = time.time()
+            self.last_event_at = self.last_event_at or self.rescan_requested_at
+
+    def _is_settled(self) -> bool:
+        """True once events have stopped arriving for the debounce window."""
+        with self._lock:
+            if not self.pending and self.rescan_requested_at is None:
+                return False
+            if self.mode == "poll" or self.last_event_at is None:
+                return True
+            now = time.time()
+            oldest = min(self.pending.values(), default=now)
+            # Never hold changes back for more than ten debounce windows
+            return (now - self.last_event_at >= self.debounce or
+                    now - oldest >= self.debounce * 10)
+
+    def _flush(self):
+        with self._lock:
+            self.in_flight, self.pending = self.pending, {}
+            self.rescan_in_flight_at, self.rescan_requested_at = self.rescan_requested_at, None
+            self.last_event_at = None
+            names = list(self.in_flight)
+            rescan = self.rescan_in_flight_at is not None
         
-        # Total workflows
+        try:
+            with get_write_db() as conn:
+                if rescan:
+                    changed, _, deleted_ids = scan_templates(conn, self.templates_dir)
+                else:
+                    changed, deleted_ids = self._stat_pending(names)
+                
+                items = list(changed.items())
+                for i in range(0, len(items), WATCH_BATCH_SIZE):
+                    ingest_templates(conn, dict(items[i:i + WATCH_BATCH_SIZE]), batch_size=WATCH_BATCH_SIZE)
+                    commit_generation(conn)
+                for i in range(0, len(deleted_ids), WATCH_BATCH_SIZE):
+                    purge_workflows(conn, deleted_ids[i:i + WATCH_BATCH_SIZE])
+                    commit_generation(conn)
+            
+            if changed or deleted_ids:
+                vector_refresher.request()
+            with self._lock:
+                self.in_flight = {}
+                self.rescan_in_flight_at = None
+                self.files_indexed += len(changed)
+                self.files_deleted += len(deleted_ids)
+                self.last_sync_at = time.time()
+                self.last_error = None
+        except Exception as e:
+            print(f"Template watcher error: {e}")
+            with self._lock:
+                self.last_error = str(e)
+                for name, seen_at in self.in_flight.items():
+                    self.pending.setdefault(name, seen_at)
+                if rescan and self.rescan_requested_at is None:
+                    self.rescan_requested_at = self.rescan_in_flight_at
+                self.in_flight = {}
+                self.rescan_in_flight_at = None
+
+    def _stat_pending(self, names: List[str]):
+        changed = {}
+        deleted_ids = []
+        for name in names:
+            path = self.templates_dir / name
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                deleted_ids.append(path.stem)
+                continue
+            if path.is_file():
+                changed[str(path)] = (stat.st_size, stat.st_mtime_ns)
+        return changed, deleted_ids
+
+template_watcher: Optional[TemplateWatcher] = None
+
+# API Endpoints
+_db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+
+async def run_db(fn, *args):
+    """Run blocking SQLite work on the bounded DB executor, off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(fn, *args))
+
+class IndexGeneration:
+    """Process-wide view of the index generation in index_meta.
+
+    Readers re-check the database at most every ``ttl`` seconds; commits made
+    in this process through commit_generation() advance it immediately. Values
+    memoized with remember() are dropped whenever the generation changes.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.value: Optional[int] = None
+        self.checked_at = 0.0
+        self._memo: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+
+    def is_fresh(self) -> bool:
+        return self.value is not None and time.monotonic() - self.checked_at < self.ttl
+
+    def set(self, generation: int):
+        with self._lock:
+            if generation != self.value:
+                self.value = generation
+                self._memo = {}
+            self.checked_at = time.monotonic()
+
+    def refresh(self) -> int:
+        """Re-read the generation from the database."""
+        with get_db() as conn:
+            row = conn.execute("SELECT value FROM index_meta WHERE key = 'generation'").fetchone()
+        self.set(row[0] if row else 0)
+        return self.value
+
+    def remember(self, generation: int, key, value):
+        with self._lock:
+            if generation == self.value and len(self._memo) < 10000:
+                self._memo[key] = value
+
+    def recall(self, key):
+        return self._memo.get(key)
+
+index_generation = IndexGeneration(INDEX_GENERATION_TTL)
+
+async def current_generation() -> int:
+    """Return the index generation, refreshing it off the event loop when stale."""
+    if index_generation.is_fresh():
+        return index_generation.value
+    return await run_db(index_generation.refresh)
+
+FTS_OPERATORS = {"AND", "OR", "NOT"}
+
+def normalize_search_query(query: str) -> str:
+    """Canonical form of an FTS5 query for cache keys.
+
+    Collapses whitespace and lowercases ASCII terms, which the unicode61
+    tokenizer folds anyway, while keeping the case-sensitive AND/OR/NOT/NEAR
+    operators intact.
+    """
+    tokens = []
+    for token in query.split():
+        if token in FTS_OPERATORS or token.startswith("NEAR") or not token.isascii():
+            tokens.append(token)
+        else:
+            tokens.append(token.lower())
+    return " ".join(tokens)
+
+def search_cache_key(request: SearchRequest) -> tuple:
+    """Cache key covering every SearchRequest field that changes the results."""
+    return (
+        normalize_search_query(request.query or ""),
+        request.category,
+        request.trigger_type,
+        request.limit,
+        tuple(sorted({service.casefold() for service in request.services or []})),
+        request.services_mode if request.services else None,
+        request.rank,
+        tuple(sorted((request.weights or {}).items())),
+        request.highlight,
+        tuple(search_projection(request) or ()),
+        request.cursor,
+        vector_build(request),
+    )
+
+def vector_build(request: SearchRequest) -> Optional[str]:
+    """The vector index build a vector/hybrid search ranks against."""
+    if request.rank not in VECTOR_RANKS:
+        return None
+    loaded = vector_index.current()
+    return loaded.build if loaded else None
+
+class SearchCache:
+    """LRU cache of serialized search responses, bounded by bytes and entries.
+
+    Entries expire after ``ttl`` seconds and the whole cache is dropped when
+    the index generation changes.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation: Optional[int] = None
+        self.bytes = 0
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (expires_at, body, next_cursor)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def _check_generation(self, generation: int):
+        if generation != self.generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.bytes = 0
+            self.generation = generation
+
+    def get(self, key, generation: int) -> Optional[Tuple[bytes, Optional[str]]]:
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, body, next_cursor = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.bytes -= len(body)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body, next_cursor
+
+    def put(self, key, body: bytes, generation: int, next_cursor: Optional[str] = None):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._check_generation(generation)
+            previous = self._entries.pop(key, None)
+            if previous:
+                self.bytes -= len(previous[1])
+            self._entries[key] = (time.monotonic() + self.ttl, body, next_cursor)
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "generation": self.generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+search_cache = SearchCache(SEARCH_CACHE_MAX_BYTES, SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_TTL)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match covers ``etag`` (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+def cache_headers(etag: str, generation: int) -> Dict[str, str]:
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={HTTP_CACHE_MAX_AGE}",
+        "X-Index-Generation": str(generation),
+    }
+
+async def check_not_modified(request: Request, response: Response) -> Optional[Response]:
+    """Tag a read response with the index generation.
+
+    Returns a 304 response if the client already has the current generation,
+    otherwise sets the cache headers on ``response`` and returns None.
+    """
+    generation = await current_generation()
+    etag = f'"g{generation}"'
+    headers = cache_headers(etag, generation)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+@app.on_event("startup")
+async def startup_event():
+    """Initialize database on startup."""
+    init_database()
+    # Auto-populate if database is empty
+    with get_db() as conn:
+        cursor = conn.cursor()
         cursor.execute("SELECT COUNT(*) FROM workflows")
-        total_workflows = cursor.fetchone()[0]
-        
-        # Category distribution
-        cursor.execute("""
-            SELECT category, COUNT(*) as count 
-            FROM workflows 
-            GROUP BY category 
-            ORDER BY count DESC
-        """)
-        categories = [{"name": row[0], "count": row[1]} for row in cursor.fetchall()]
-        
-        # Trigger distribution
-        cursor.execute("""
-            SELECT trigger_type, COUNT(*) as count 
-            FROM workflows 
-            WHERE trigger_type IS NOT NULL
-            GROUP BY trigger_type 
-            ORDER BY count DESC
-        """)
-        triggers = [{"type": row[0], "count": row[1]} for row in cursor.fetchall()]
+        count = cursor.fetchone()[0]
+        if count == 0:
+            print("Database is empty, auto-populating...")
+            populate_database()
+    with get_write_db() as conn:
+        refresh_vector_index(conn)
+    
+    global template_watcher
+    if TEMPLATES_WATCH in ("auto", "inotify", "poll"):
+        template_watcher = TemplateWatcher(
+            TEMPLATES_DIR,
+            mode=TEMPLATES_WATCH,
+            debounce=TEMPLATES_WATCH_DEBOUNCE,
+            poll_interval=TEMPLATES_WATCH_POLL_INTERVAL
+        )
+        template_watcher.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the template watcher."""
+    if template_watcher:
+        template_watcher.stop()
+    _db_executor.shutdown(wait=False)
+    if _read_pool:
+        _read_pool.close()
+    
+@app.get("/health")
+async def health_check():
+    """Health check endpoint."""
+    return {"status": "healthy", "database": DATABASE_PATH.exists()}
+
+@app.get("/api/index/status")
+async def index_status():
+    """Report template watcher state and how far the index lags behind TEMPLATES_DIR."""
+    vectors = {**await run_db(vector_index.status), "rebuild_pending": vector_refresher.pending()}
+    if not template_watcher:
+        return {"enabled": False, "mode": None, "pending_files": 0, "lag_seconds": None, "vectors": vectors}
+    return {**template_watcher.status(), "vectors": vectors}
+
+WORKFLOW_TEMPLATE_COLUMNS = [
+    "id", "name", "description", "category", "nodes_count", "services",
+    "trigger_type", "complexity", "use_cases"
+]
+
+def select_columns(columns: List[str], alias: str = "") -> str:
+    """Render a column list for SELECT, optionally qualified with a table alias."""
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(prefix + column for column in columns)
+
+def row_to_fields(row, fields: List[str], **extra) -> Dict[str, Any]:
+    """Build a projected result from a workflows row, like row_to_template."""
+    result = {}
+    for field in fields:
+        if field in extra:
+            result[field] = extra[field]
+        elif field in ("services", "use_cases"):
+            result[field] = json.loads(row[field]) if row[field] else []
+        else:
+            result[field] = row[field]
+    return result
+
+def row_to_template(row, model=WorkflowTemplate, **extra) -> WorkflowTemplate:
+    """Build a result model from a workflows row."""
+    return model(
+        id=row["id"],
+        name=row["name"],
+        description=row["description"],
+        category=row["category"],
+        nodes_count=row["nodes_count"],
+        services=json.loads(row["services"]) if row["services"] else [],
+        trigger_type=row["trigger_type"],
+        complexity=row["complexity"],
+        use_cases=json.loads(row["use_cases"]) if row["use_cases"] else [],
+        **extra
+    )
+
+def bm25_weights(overrides: Optional[Dict[str, float]] = None) -> List[float]:
+    """Return bm25() column weights in workflows_fts column order."""
+    weights = dict(SEARCH_BM25_WEIGHTS)
+    for column, weight in (overrides or {}).items():
+        if column not in weights:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Unknown search column '{column}', expected one of {', '.join(FTS_COLUMNS)}"
+            )
+        weights[column] = float(weight)
+    return [weights[column] for column in FTS_COLUMNS]
+
+def search_projection(request: SearchRequest) -> Optional[List[str]]:
+    """The result fields a search asked for, or None for full results."""
+    if request.fields is None and request.exclude is None and request.view == "full":
+        return None
+    return resolve_projection(SEARCH_FIELDS, request.fields, request.exclude, request.view, SEARCH_SUMMARY_FIELDS)
+
+def encode_cursor(scope: str, keys: List[Any]) -> str:
+    """Opaque keyset cursor: the sort keys of the last row returned."""
+    payload = json.dumps([scope, *keys], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, scope: str, key_count: int) -> List[Any]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(payload, list) or len(payload) != key_count + 1 or payload[0] != scope:
+        raise HTTPException(status_code=400, detail="Cursor does not belong to this query")
+    return payload[1:]
+
+def search_cursor_scope(request: SearchRequest) -> str:
+    """Identify the result ordering a search cursor is valid for."""
+    ordering = search_cache_key(request)[:8]  # query, filters, rank and weights
+    return "search:" + hashlib.sha1(repr(ordering).encode("utf-8")).hexdigest()[:16]
+
+def score_cursor_stamp(conn, loaded: Optional["VectorIndexBuild"] = None) -> str:
+    """The index state a score-ranked cursor is valid for.
+
+    bm25 scores depend on corpus statistics and vector scores on the vector
+    build, so resuming after a score from another state could skip or
+    repeat rows. Read it before ranking: a commit in between then only
+    makes the cursor expire early.
+    """
+    generation = conn.execute("SELECT value FROM index_meta WHERE key = 'generation'").fetchone()[0]
+    return f"{generation}:{loaded.build}" if loaded else str(generation)
+
+def check_cursor_stamp(after: Optional[List[Any]], stamp: str):
+    if after and after[0] != stamp:
+        raise HTTPException(
+            status_code=410,
+            detail="Cursor expired: the index changed since the previous page, repeat the search without a cursor"
+        )
+
+def workflow_filters(category: Optional[str], trigger_type: Optional[str],
+                     services: Optional[List[str]], services_mode: str = "all") -> Tuple[List[str], List[Any]]:
+    """WHERE conditions (on workflows columns) and their parameters for the common filters."""
+    filters = []
+    params = []
+    if category:
+        filters.append("category = ?")
+        params.append(category)
+    if trigger_type:
+        filters.append("trigger_type = ?")
+        params.append(trigger_type)
+    if services:
+        # Answered from idx_workflow_services_service; matching is case-insensitive
+        services = list({service.casefold(): service for service in services}.values())
+        placeholders = ", ".join("?" * len(services))
+        if services_mode == "any":
+            filters.append(f"id IN (SELECT workflow_id FROM workflow_services WHERE service IN ({placeholders}))")
+            params += services
+        else:
+            filters.append(
+                f"id IN (SELECT workflow_id FROM workflow_services WHERE service IN ({placeholders}) "
+                f"GROUP BY workflow_id HAVING COUNT(*) = ?)"
+            )
+            params += [*services, len(services)]
+    return filters, params
+
+VECTOR_RANKS = ("vector", "hybrid")
+FTS_SYNTAX = re.compile(r'["():*^+]|\bNEAR\b|\b(?:AND|OR|NOT)\b')
+
+def any_terms_query(query: str) -> str:
+    """OR together the words of a plain query; queries using FTS5 syntax are kept as is."""
+    if FTS_SYNTAX.search(query):
+        return query
+    return " OR ".join(f'"{word}"' for word in re.findall(r"\w+", query)) or query
+
+def semantic_ranking(conn, request: SearchRequest, filters: List[str], filter_params: List[Any],
+                     loaded: Optional[VectorIndexBuild]) -> List[Tuple[int, float]]:
+    """(rowid, score) for rank=vector or rank=hybrid, best first.
+
+    vector ranks by cosine similarity to the query's LSA vector. hybrid
+    fuses that ranking with the bm25 ranking of any of the query's words
+    (reciprocal rank fusion over the top VECTOR_CANDIDATES of each).
+    """
+    if loaded is None:
+        raise HTTPException(status_code=503, detail=f"Vector index unavailable: {vector_index.status()['reason']}")
+    
+    allowed = None
+    if filters:
+        allowed = np.array([row[0] for row in conn.execute(
+            f"SELECT rowid FROM workflows WHERE {' AND '.join(filters)}", filter_params
+        )], dtype=np.int64)
+    query_vector = loaded.embed(request.query)
+    vector_ranked = [] if query_vector is None else loaded.top(query_vector, VECTOR_CANDIDATES, allowed)
+    if request.rank == "vector":
+        return vector_ranked
+    
+    where = "workflows_fts MATCH ?"
+    params = [any_terms_query(request.query)]
+    if filters:
+        where += f" AND rowid IN (SELECT rowid FROM workflows WHERE {' AND '.join(filters)})"
+        params += filter_params
+    bm25_ranked = conn.execute(f"""
+        SELECT rowid FROM workflows_fts WHERE {where}
+        ORDER BY bm25(workflows_fts, {', '.join('?' * len(FTS_COLUMNS))}), rowid LIMIT ?
+    """, [*params, *bm25_weights(request.weights), VECTOR_CANDIDATES]).fetchall()
+    
+    fused: Dict[int, float] = {}
+    for ranking in ([row[0] for row in bm25_ranked], [rowid for rowid, _ in vector_ranked]):
+        for position, rowid in enumerate(ranking, 1):
+            fused[rowid] = fused.get(rowid, 0.0) + 1.0 / (RRF_K + position)
+    return sorted(fused.items(), key=lambda item: (-item[1], item[0]))
+
+def semantic_search_sync(request: SearchRequest, projection: Optional[List[str]], columns: List[str],
+                         highlight: bool, filters: List[str], filter_params: List[Any],
+                         scope: str, after: Optional[List[Any]]) -> Tuple[List[Any], Optional[str]]:
+    """search_templates_sync for rank=vector/hybrid: rank in memory, then read one page of rows."""
+    with get_db() as conn:
+        loaded = vector_index.current()
+        stamp = score_cursor_stamp(conn, loaded)
+        check_cursor_stamp(after, stamp)
+        ranked = semantic_ranking(conn, request, filters, filter_params, loaded)
+        if after:
+            _, score, rowid = after
+            ranked = [item for item in ranked if item[1] < score or (item[1] == score and item[0] > rowid)]
+        page = ranked[:request.limit]
+        page_rowids = json.dumps([rowid for rowid, _ in page])
+        rows = {
+            row["rowid"]: row for row in conn.execute(
+                f"SELECT w.rowid, {select_columns(columns, 'w')} FROM workflows w "
+                f"WHERE w.rowid IN (SELECT value FROM json_each(?))", (page_rowids,)
+            )
+        }
+        highlights = {}
+        if highlight and page:
+            highlights = {
+                row[0]: {"name": row[1], "description": row[2]}
+                for row in conn.execute(
+                    "SELECT rowid, highlight(workflows_fts, 1, ?, ?), snippet(workflows_fts, 2, ?, ?, '…', ?) "
+                    "FROM workflows_fts WHERE workflows_fts MATCH ? AND rowid IN (SELECT value FROM json_each(?))",
+                    (*SEARCH_HIGHLIGHT_TAGS, *SEARCH_HIGHLIGHT_TAGS, SEARCH_SNIPPET_TOKENS,
+                     any_terms_query(request.query), page_rowids)
+                )
+            }
+    
+    results = []
+    for rowid, score in page:
+        row = rows.get(rowid)
+        if row is None:  # deleted since the vector index was built
+            continue
+        extra = {"score": score, "highlights": highlights.get(rowid)}
+        if projection is None:
+            results.append(row_to_template(row, SearchResult, **extra))
+        else:
+            results.append(row_to_fields(row, projection, **extra))
+    next_cursor = None
+    if len(ranked) > request.limit:
+        next_cursor = encode_cursor(scope, [stamp, page[-1][1], page[-1][0]])
+    return results, next_cursor
+
+def search_templates_sync(request: SearchRequest) -> Tuple[List[Any], Optional[str]]:
+    """Run an FTS5 search and build the result models.
+
+    With a projection, only the requested columns are read and results are
+    plain dicts holding just those fields. Returns the results and, when
+    the page is full, a keyset cursor for the next one. Cursors resume
+    after the last row's (score, rowid) or (nodes_count, id). Scores move
+    with the corpus, so score-ranked cursors also carry the index state
+    they were issued for and expire (410) once it changes.
+    """
+    projection = search_projection(request)
+    columns = WORKFLOW_TEMPLATE_COLUMNS
+    highlight = request.highlight
+    if projection is not None:
+        columns = [column for column in columns
+                   if column in ("id", "nodes_count") or column in projection]
+        highlight = highlight and "highlights" in projection
+    
+    filters, filter_params = workflow_filters(
+        request.category, request.trigger_type, request.services, request.services_mode
+    )
+    
+    has_query = bool(request.query and request.query.strip())
+    ranked_by_bm25 = has_query and request.rank == "bm25"
+    scored = has_query and request.rank != "nodes_count"
+    scope = search_cursor_scope(request)
+    after = decode_cursor(request.cursor, scope, 3 if scored else 2) if request.cursor else None
+    if has_query and request.rank in VECTOR_RANKS:
+        return semantic_search_sync(request, projection, columns, highlight, filters, filter_params, scope, after)
+    
+    if ranked_by_bm25:
+        # Rank inside the FTS table and keep only the top-k rowids, so the
+        # wide workflows rows are only read for the results actually returned.
+        ranked_columns = [f"rowid, bm25(workflows_fts, {', '.join('?' * len(FTS_COLUMNS))}) AS score"]
+        params = bm25_weights(request.weights)
+        if highlight:
+            ranked_columns.append(
+                "highlight(workflows_fts, 1, ?, ?) AS name_highlight, "
+                "snippet(workflows_fts, 2, ?, ?, '…', ?) AS description_snippet"
+            )
+            params += [*SEARCH_HIGHLIGHT_TAGS, *SEARCH_HIGHLIGHT_TAGS, SEARCH_SNIPPET_TOKENS]
         
-        # Complexity distribution
-        cursor.execute("""
-            SELECT complexity, COUNT(*) as count 
-            FROM workflows 
-            GROUP BY complexity
-        """)
-        complexity = [{"level": row[0], "count": row[1]} for row in cursor.fetchall()]
+        where = "workflows_fts MATCH ?"
+        params.append(request.query)
+        if filters:
+            where += f" AND rowid IN (SELECT rowid FROM workflows WHERE {' AND '.join(filters)})"
+            params += filter_params
+        if after:
+            where += " AND (score > ? OR (score = ? AND rowid > ?))"
+            params += [after[1], after[1], after[2]]
+        params.append(request.limit)
         
-        # Average nodes per workflow
-        cursor.execute("SELECT AVG(nodes_count) FROM workflows")
-        result = cursor.fetchone()
-        avg_nodes = round(result[0], 1) if result and result[0] else 0
+        query = f"""
+            SELECT {select_columns(columns, 'w')}, ranked.*
+            FROM (
+                SELECT {', '.join(ranked_columns)}
+                FROM workflows_fts
+                WHERE {where}
+                ORDER BY score, rowid
+                LIMIT ?
+            ) AS ranked
+            JOIN workflows w ON w.rowid = ranked.rowid
+            ORDER BY ranked.score, ranked.rowid
+        """
+    else:
+        keyset = ""
+        if after:
+            keyset = " AND (w.nodes_count < ? OR (w.nodes_count = ? AND w.id > ?))"
+            filter_params += [after[0], after[0], after[1]]
+        if has_query:
+            query = f"""
+                SELECT {select_columns(columns, 'w')} FROM workflows w
+                JOIN workflows_fts fts ON w.rowid = fts.rowid
+                WHERE workflows_fts MATCH ?
+                {''.join(f' AND w.{f}' for f in filters)}{keyset}
+                ORDER BY w.nodes_count DESC, w.id LIMIT ?
+            """
+            params = [request.query, *filter_params, request.limit]
+        else:
+            # If no search query, return all with filters
+            query = f"""
+                SELECT {select_columns(columns, 'w')} FROM workflows w
+                WHERE 1=1 {''.join(f' AND w.{f}' for f in filters)}{keyset}
+                ORDER BY w.nodes_count DESC, w.id LIMIT ?
+            """
+            params = [*filter_params, request.limit]
+    
+    with get_db() as conn:
+        stamp = None
+        if ranked_by_bm25:
+            stamp = score_cursor_stamp(conn)
+            check_cursor_stamp(after, stamp)
+        results = []
+        rows = conn.execute(query, params).fetchall()
+        for row in rows:
+            keys = row.keys()
+            highlights = None
+            if "name_highlight" in keys:
+                highlights = {
+                    "name": row["name_highlight"],
+                    "description": row["description_snippet"],
+                }
+            extra = {"score": -row["score"] if "score" in keys else None, "highlights": highlights}
+            if projection is None:
+                results.append(row_to_template(row, SearchResult, **extra))
+            else:
+                results.append(row_to_fields(row, projection, **extra))
         
-        # Total nodes across all workflows
-        cursor.execute("SELECT SUM(nodes_count) FROM workflows")
-        total_nodes = cursor.fetchone()[0] or 0
+        next_cursor = None
+        if rows and len(rows) == request.limit:
+            last = rows[-1]
+            sort_keys = [stamp, last["score"], last["rowid"]] if ranked_by_bm25 else [last["nodes_count"], last["id"]]
+            next_cursor = encode_cursor(scope, sort_keys)
+        return results, next_cursor
+
+SEARCH_RESULTS_ADAPTER = TypeAdapter(List[SearchResult])
+
+async def cached_search(request: SearchRequest, generation: int) -> Tuple[bytes, Optional[str], bool]:
+    """Return (serialized results, next cursor, cache hit) through the search cache."""
+    key = search_cache_key(request)
+    cached = search_cache.get(key, generation)
+    if cached is not None:
+        return (*cached, True)
+    results, next_cursor = await run_db(search_templates_sync, request)
+    if search_projection(request) is None:
+        body = SEARCH_RESULTS_ADAPTER.dump_json(results)
+    else:
+        body = compact_json(results)
+    search_cache.put(key, body, generation, next_cursor)
+    return body, next_cursor, False
+
+@app.post("/api/search", response_model=List[SearchResult])
+async def search_templates(request: SearchRequest):
+    """Search workflow templates with FTS5."""
+    generation = await current_generation()
+    body, next_cursor, hit = await cached_search(request, generation)
+    headers = {"X-Cache": "HIT" if hit else "MISS", "X-Index-Generation": str(generation)}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Report search cache hit, miss and eviction counters."""
+    return {"search": search_cache.stats()}
+
+def template_etag(file_hash: Optional[str], fields: List[str] = TEMPLATE_FIELDS) -> Optional[str]:
+    """ETag of one projection of a template: its file_hash, suffixed unless all fields are returned.
+
+    Projections are different representations, so they must never
+    validate against each other.
+    """
+    if not file_hash:
+        return None
+    if list(fields) == TEMPLATE_FIELDS:
+        return f'"{file_hash}"'
+    return f'"{file_hash}-{hashlib.sha1(",".join(fields).encode("utf-8")).hexdigest()[:8]}"'
+
+def template_etag_sync(template_id: str, fields: List[str] = TEMPLATE_FIELDS) -> Optional[str]:
+    """Look up a template's ETag from the covering index."""
+    with get_db() as conn:
+        row = conn.execute("SELECT file_hash FROM workflows WHERE id = ?", (template_id,)).fetchone()
+        return template_etag(row[0], fields) if row else None
+
+@functools.lru_cache(maxsize=None)
+def template_row_sql(fields: tuple, batch: bool = False) -> str:
+    """SELECT for a template row reading only the columns a projection needs.
+
+    The batch form takes the ids as one JSON array parameter, so a single
+    cached statement serves every batch size.
+    """
+    columns = ["w.id", "w.file_hash"]
+    columns += [f"w.{field}" for field in ("name", "description") if field in fields]
+    needs_body = not TEMPLATE_BODY_FIELDS.isdisjoint(fields)
+    if needs_body or "statistics" in fields:
+        columns += ["w.statistics", "w.body_layout"]
+    if needs_body:
+        columns += ["w.workflow_json", "b.codec AS body_codec", "b.body"]
+    join = "LEFT JOIN workflow_bodies b ON b.workflow_id = w.id" if needs_body else ""
+    where = "w.id IN (SELECT value FROM json_each(?))" if batch else "w.id = ?"
+    return f"SELECT {', '.join(columns)} FROM workflows w {join} WHERE {where}"
+
+def fetch_template_row(conn, template_id: str, fields: tuple = tuple(TEMPLATE_FIELDS)):
+    row = conn.execute(template_row_sql(fields), (template_id,)).fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return row
+
+def build_template_metadata(conn, row) -> TemplateMetadata:
+    """Parse a stored workflow and derive its metadata."""
+    # Parse workflow JSON, decompressing it if it is not stored inline
+    workflow_json = json.loads(
+        decode_workflow_body(conn, row["workflow_json"], row["body_codec"], row["body"])
+    )
+    
+    # Extract nodes and connections
+    nodes = workflow_json.get("nodes", [])
+    connections = workflow_json.get("connections", {})
+    
+    return TemplateMetadata(
+        id=row["id"],
+        name=row["name"],
+        description=row["description"] or "",
+        workflow_json=workflow_json,
+        nodes=nodes,
+        connections=connections,
+        statistics=template_statistics(nodes, connections)
+    )
+
+def render_template_json(conn, row, fields: List[str] = TEMPLATE_FIELDS) -> bytes:
+    """Serialize a (projected) TemplateMetadata response for a row.
+
+    Rows with a body_layout are spliced together from the stored compact
+    body, its nodes/connections spans and the precomputed statistics,
+    without parsing the workflow; the body is only decompressed if a body
+    field was requested.
+    """
+    keys = row.keys()
+    if "body_layout" in keys and row["body_layout"] is None:
+        # Rare legacy path: reparse the workflow from a full row
+        row = fetch_template_row(conn, row["id"])
+        include = None if fields == TEMPLATE_FIELDS else set(fields)
+        return TEMPLATE_METADATA_ADAPTER.dump_json(build_template_metadata(conn, row), include=include)
+    
+    body = None
+    if "body" in keys:
+        body = workflow_body_bytes(conn, row["workflow_json"], row["body_codec"], row["body"])
+        nodes_start, nodes_end, connections_start, connections_end = json.loads(row["body_layout"])
+    
+    parts = []
+    for field in fields:
+        if field == "workflow_json":
+            value = body
+        elif field == "nodes":
+            value = body[nodes_start:nodes_end] if nodes_start is not None else b"[]"
+        elif field == "connections":
+            value = body[connections_start:connections_end] if connections_start is not None else b"{}"
+        elif field == "statistics":
+            value = row["statistics"].encode("utf-8")
+        elif field == "description":
+            value = compact_json(row["description"] or "")
+        else:
+            value = compact_json(row[field])
+        parts.append(b'"' + field.encode("utf-8") + b'":' + value)
+    return b"{" + b",".join(parts) + b"}"
+
+TEMPLATE_METADATA_ADAPTER = TypeAdapter(TemplateMetadata)
+
+def fetch_template_sync(template_id: str, fields: List[str] = TEMPLATE_FIELDS) -> Tuple[bytes, Optional[str]]:
+    """Load one template as serialized response JSON, with its ETag."""
+    with get_db() as conn:
+        row = fetch_template_row(conn, template_id, tuple(fields))
+        return render_template_json(conn, row, fields), template_etag(row["file_hash"], fields)
+
+@app.get("/api/template/{template_id}", response_model=TemplateMetadata)
+async def get_template_metadata(
+    template_id: str,
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    exclude: Optional[str] = Query(None, description="Comma-separated fields to leave out"),
+    view: Literal["full", "summary"] = Query("full", description="'summary' leaves out the workflow body")
+):
+    """Get detailed metadata for a specific template."""
+    projection = resolve_projection(
+        TEMPLATE_FIELDS, split_fields(fields), split_fields(exclude), view, TEMPLATE_SUMMARY_FIELDS
+    )
+    generation = await current_generation()
+    key = ("template-etag", template_id, tuple(projection))
+    if request.headers.get("if-none-match"):
+        etag = index_generation.recall(key) or await run_db(template_etag_sync, template_id, projection)
+        if etag and etag_matches(request, etag):
+            return Response(status_code=304, headers=cache_headers(etag, generation))
+    
+    content, etag = await run_db(fetch_template_sync, template_id, projection)
+    headers = {}
+    if etag:
+        index_generation.remember(generation, key, etag)
+        headers = cache_headers(etag, generation)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+def fetch_templates_batch_sync(template_ids: List[str], fields: List[str]) -> bytes:
+    """Load several templates with one query as a serialized batch response.
+
+    Templates come back in request order (duplicates collapsed); ids with
+    no row are listed under ``missing``.
+    """
+    template_ids = list(dict.fromkeys(template_ids))
+    with get_db() as conn:
+        rows = conn.execute(template_row_sql(tuple(fields), batch=True), (json.dumps(template_ids),)).fetchall()
+        by_id = {row["id"]: row for row in rows}
+        templates = [render_template_json(conn, by_id[template_id], fields)
+                     for template_id in template_ids if template_id in by_id]
+    missing = [template_id for template_id in template_ids if template_id not in by_id]
+    return b'{"templates":[' + b",".join(templates) + b'],"missing":' + compact_json(missing) + b"}"
+
+@app.post("/api/templates/batch")
+async def get_templates_batch(request: TemplateBatchRequest):
+    """Get several templates in one round trip, in request order."""
+    projection = resolve_projection(
+        TEMPLATE_FIELDS, request.fields, request.exclude, request.view, TEMPLATE_SUMMARY_FIELDS
+    )
+    generation = await current_generation()
+    content = await run_db(fetch_templates_batch_sync, request.ids, projection)
+    return Response(content=content, media_type="application/json",
+                    headers={"X-Index-Generation": str(generation)})
+
+def list_categories_sync():
+    """Read per-category counts from facet_counts."""
+    with get_db() as conn:
+        return {
+            "categories": [
+                {"name": value, "count": count}
+                for value, count in read_facet(conn, "category")
+            ]
+        }
+
+@app.get("/api/categories")
+async def list_categories(request: Request, response: Response):
+    """List all available categories with counts."""
+    not_modified = await check_not_modified(request, response)
+    if not_modified:
+        return not_modified
+    return await run_db(list_categories_sync)
+
+def list_trigger_types_sync():
+    """Read per-trigger counts from facet_counts."""
+    with get_db() as conn:
+        return {
+            "triggers": [
+                {"type": value, "count": count}
+                for value, count in read_facet(conn, "trigger_type")
+            ]
+        }
+
+@app.get("/api/triggers")
+async def list_trigger_types(request: Request, response: Response):
+    """List all trigger types with counts."""
+    not_modified = await check_not_modified(request, response)
+    if not_modified:
+        return not_modified
+    return await run_db(list_trigger_types_sync)
+
+def list_services_sync():
+    """Read per-service counts from facet_counts."""
+    with get_db() as conn:
+        services = [
+            {"name": value, "count": count}
+            for value, count in read_facet(conn, "service", limit=50)  # Top 50 services
+        ]
+        total = conn.execute("SELECT COUNT(*) FROM facet_counts WHERE facet = 'service'").fetchone()[0]
         
         return {
-            "total_workflows": total_workflows,
-            "total_nodes": total_nodes,
-            "average_nodes_per_workflow": avg_nodes,
-            "categories": categories,
-            "trigger_types": triggers,
-            "complexity_distribution": complexity
+            "services": services,
+            "total_unique_services": total
         }
 
+@app.get("/api/services")
+async def list_services(request: Request, response: Response):
+    """List all services/integrations with counts."""
+    not_modified = await check_not_modified(request, response)
+    if not_modified:
+        return not_modified
+    return await run_db(list_services_sync)
+
+def get_database_stats_sync():
+    """Assemble /api/stats from the summary tables."""
+    with get_db() as conn:
+        return read_index_stats(conn)
+
+@app.get("/api/stats")
+async def get_database_stats(request: Request, response: Response):
+    """Get comprehensive database statistics."""
+    not_modified = await check_not_modified(request, response)
+    if not_modified:
+        return not_modified
+    return await run_db(get_database_stats_sync)
+
+def list_popular_templates_sync(limit: int, cursor: Optional[str] = None) -> Tuple[List[WorkflowTemplate], Optional[str]]:
+    """Query the most popular templates, one keyset page at a time."""
+    where = ""
+    params = []
+    if cursor:
+        popularity, last_id = decode_cursor(cursor, "popular", 2)
+        where = "WHERE popularity <= ? AND (popularity < ? OR id > ?)"
+        params = [popularity, popularity, last_id]
+    
+    with get_db() as conn:
+        # Index range scan over idx_workflows_popularity
+        rows = conn.execute(f"""
+            SELECT {select_columns(WORKFLOW_TEMPLATE_COLUMNS)}, popularity FROM workflows 
+            {where}
+            ORDER BY popularity DESC, id
+            LIMIT ?
+        """, (*params, limit)).fetchall()
+        
+        next_cursor = None
+        if rows and len(rows) == limit:
+            next_cursor = encode_cursor("popular", [rows[-1]["popularity"], rows[-1]["id"]])
+        return [row_to_template(row) for row in rows], next_cursor
+
 @app.get("/api/popular", response_model=List[WorkflowTemplate])
-async def list_popular_templates(limit: int = Query(10, le=50)):
+async def list_popular_templates(
+    request: Request,
+    response: Response,
+    limit: int = Query(10, le=50),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page")
+):
     """Get most popular templates based on complexity, AI features, and node count."""
+    not_modified = await check_not_modified(request, response)
+    if not_modified:
+        return not_modified
+    templates, next_cursor = await run_db(list_popular_templates_sync, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return templates
+
+def find_similar_templates_sync(template_id: str, limit: int, min_similarity: float = 0.0) -> List[SimilarTemplate]:
+    """Rank the LSH candidates of a template by estimated Jaccard similarity.
+
+    Only workflows sharing at least one band bucket are scored, so the cost
+    follows the size of those buckets rather than of the corpus.
+    """
     with get_db() as conn:
-        cursor = conn.execute("""
-            SELECT * FROM workflows 
-            ORDER BY 
-                CASE complexity 
-                    WHEN 'advanced' THEN 3 
-                    WHEN 'intermediate' THEN 2 
-                    ELSE 1 
-                END DESC,
-                CASE 
-                    WHEN workflow_json LIKE '%ai%' OR workflow_json LIKE '%openai%' OR workflow_json LIKE '%gpt%' THEN 1
-                    ELSE 0
-                END DESC,
-                nodes_count DESC 
-            LIMIT ?
-        """, (limit,))
+        if not conn.execute("SELECT 1 FROM workflows WHERE id = ?", (template_id,)).fetchone():
+            raise HTTPException(status_code=404, detail="Template not found")
+        row = conn.execute("SELECT signature FROM workflow_minhash WHERE workflow_id = ?", (template_id,)).fetchone()
+        if not row:
+            return []
+        signature = row[0]
         
-        results = []
-        for row in cursor:
-            results.append(WorkflowTemplate(
-                id=row["id"],
-                name=row["name"],
-                description=row["description"],
-                category=row["category"],
-                nodes_count=row["nodes_count"],
-                services=json.loads(row["services"]) if row["services"] else [],
-                trigger_type=row["trigger_type"],
-                complexity=row["complexity"],
-                use_cases=json.loads(row["use_cases"]) if row["use_cases"] else []
-            ))
-            
-        return results
+        # Primary key lookups per (band, bucket), most shared bands first
+        candidates = conn.execute("""
+            SELECT m.workflow_id, m.signature FROM (
+                SELECT workflow_id, COUNT(*) AS bands FROM workflow_lsh
+                WHERE (band, bucket) IN (SELECT band, bucket FROM workflow_lsh WHERE workflow_id = ?)
+                  AND workflow_id != ?
+                GROUP BY workflow_id
+                ORDER BY bands DESC
+                LIMIT ?
+            ) c JOIN workflow_minhash m ON m.workflow_id = c.workflow_id
+        """, (template_id, template_id, SIMILAR_CANDIDATES)).fetchall()
+        
+        similarities = minhash_similarities(signature, [row[1] for row in candidates])
+        scored = sorted(zip(similarities, (row[0] for row in candidates)), key=lambda item: (-item[0], item[1]))
+        scored = [(similarity, workflow_id) for similarity, workflow_id in scored if similarity >= min_similarity][:limit]
+        if not scored:
+            return []
+        rows = conn.execute(f"""
+            SELECT {select_columns(WORKFLOW_TEMPLATE_COLUMNS)} FROM workflows
+            WHERE id IN (SELECT value FROM json_each(?))
+        """, (json.dumps([workflow_id for _, workflow_id in scored]),)).fetchall()
+        by_id = {row["id"]: row for row in rows}
+        return [row_to_template(by_id[workflow_id], SimilarTemplate, similarity=similarity)
+                for similarity, workflow_id in scored if workflow_id in by_id]
+
+@app.get("/api/template/{template_id}/similar", response_model=List[SimilarTemplate])
+async def find_similar_templates(
+    template_id: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(10, ge=1, le=50),
+    min_similarity: float = Query(0.0, ge=0.0, le=1.0, description="Minimum estimated Jaccard similarity")
+):
+    """Find templates built from the same node types, services and connections."""
+    not_modified = await check_not_modified(request, response)
+    if not_modified:
+        return not_modified
+    return await run_db(find_similar_templates_sync, template_id, limit, min_similarity)
+
+EXPORT_FIELDS = WORKFLOW_TEMPLATE_COLUMNS + ["workflow_json"]
+
+def render_export_row(conn, row, fields: List[str]) -> bytes:
+    """Serialize one export row as a compact JSON object."""
+    parts = []
+    for field in fields:
+        if field == "workflow_json":
+            value = workflow_body_bytes(conn, row["workflow_json"], row["body_codec"], row["body"])
+        elif field in ("services", "use_cases"):
+            value = compact_json(json.loads(row[field]) if row[field] else [])
+        else:
+            value = compact_json(row[field])
+        parts.append(b'"' + field.encode("utf-8") + b'":' + value)
+    return b"{" + b",".join(parts) + b"}"
+
+def export_chunk(conn, cursor, fields: List[str]) -> bytes:
+    """Render the next EXPORT_FETCH_SIZE rows as NDJSON lines."""
+    return b"".join(render_export_row(conn, row, fields) + b"\n" for row in cursor.fetchmany(EXPORT_FETCH_SIZE))
+
+async def stream_export(conn, cursor, fields: List[str]):
+    """Yield NDJSON chunks from an export cursor, closing its connection at the end.
+
+    The single statement reads one WAL snapshot, so a concurrent ingest
+    never tears the export, and only one fetchmany batch is in memory.
+    """
+    try:
+        while True:
+            chunk = await run_db(export_chunk, conn, cursor, fields)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        conn.close()
+
+@app.get("/api/export")
+async def export_templates(
+    query: Optional[str] = Query(None, description="FTS5 query the templates must match"),
+    category: Optional[str] = None,
+    trigger_type: Optional[str] = None,
+    services: Optional[List[str]] = Query(None),
+    services_mode: Literal["all", "any"] = "all",
+    fields: Optional[str] = Query(None, description="Comma-separated fields; add workflow_json for the full body")
+):
+    """Stream the catalog, or a filtered slice of it, as NDJSON ordered by id."""
+    projection = resolve_projection(
+        EXPORT_FIELDS, split_fields(fields) or WORKFLOW_TEMPLATE_COLUMNS, None, "full", WORKFLOW_TEMPLATE_COLUMNS
+    )
+    filters, params = workflow_filters(category, trigger_type, services, services_mode)
+    if query and query.strip():
+        filters.append("rowid IN (SELECT rowid FROM workflows_fts WHERE workflows_fts MATCH ?)")
+        params.append(query)
+    
+    columns = [f"w.{column}" for column in WORKFLOW_TEMPLATE_COLUMNS if column == "id" or column in projection]
+    join = ""
+    if "workflow_json" in projection:
+        columns += ["w.workflow_json", "b.codec AS body_codec", "b.body"]
+        join = "LEFT JOIN workflow_bodies b ON b.workflow_id = w.id"
+    sql = f"""
+        SELECT {', '.join(columns)} FROM workflows w {join}
+        WHERE 1=1 {''.join(f' AND w.{f}' for f in filters)}
+        ORDER BY w.id
+    """
+    generation = await current_generation()
+    # A dedicated connection: the export may outlive any pooled checkout.
+    # Executing before streaming starts surfaces bad queries as errors.
+    conn = connect_db(read_only=True)
+    try:
+        cursor = await run_db(conn.execute, sql, params)
+    except Exception:
+        conn.close()
+        raise
+    return StreamingResponse(
+        stream_export(conn, cursor, projection),
+        media_type="application/x-ndjson",
+        headers={"X-Index-Generation": str(generation)}
+    )
 
 # Command line interface for database management
 def cli():
@@ -772,6 +3225,22 @@ def cli():
     parser.add_argument("--populate", action="store_true", help="Populate database with workflows")
     parser.add_argument("--force-reindex", action="store_true", help="Force reindex all workflows")
     parser.add_argument("--stats", action="store_true", help="Show database statistics only")
+    parser.add_argument("--fts", choices=["rebuild", "optimize", "merge", "integrity-check"],
+                        help="Run an FTS index maintenance operation")
+    parser.add_argument("--recompute-popularity", action="store_true",
+                        help="Recompute popularity scores from stored metadata")
+    parser.add_argument("--popularity-scorer", default=None,
+                        help="Popularity scorer name or module:function (default: POPULARITY_SCORER)")
+    parser.add_argument("--rebuild-summaries", action="store_true",
+                        help="Recompute the category/trigger/service summary tables")
+    parser.add_argument("--build-vectors", action="store_true",
+                        help="Rebuild the vector index used by rank=vector/hybrid searches")
+    parser.add_argument("--migrate-storage", choices=WORKFLOW_STORAGE_MODES,
+                        help="Convert stored workflow bodies to inline JSON or compressed blobs")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Ingestion worker processes (default: INGEST_WORKERS or CPU count)")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Rows per executemany batch during ingestion (default: INGEST_BATCH_SIZE)")
     
     args = parser.parse_args()
     
@@ -781,25 +3250,80 @@ def cli():
         print("Database initialized.")
         return
         
+    if args.fts:
+        init_database()
+        with get_write_db() as conn:
+            started = time.perf_counter()
+            try:
+                fts_maintenance(conn, args.fts)
+            except sqlite3.DatabaseError as e:
+                print(f"FTS {args.fts} failed: {e}")
+                raise SystemExit(1)
+            print(f"FTS {args.fts} completed in {time.perf_counter() - started:.2f}s")
+        return
+        
+    if args.recompute_popularity:
+        init_database()
+        with get_write_db() as conn:
+            count = recompute_popularity(conn, args.popularity_scorer)
+            commit_generation(conn)
+        print(f"Recomputed popularity for {count} workflows")
+        return
+        
+    if args.rebuild_summaries:
+        init_database()
+        with get_write_db() as conn:
+            refresh_summary_tables(conn)
+            commit_generation(conn)
+        print("Summary tables rebuilt.")
+        return
+        
+    if args.build_vectors:
+        if np is None or VECTOR_INDEX == "off":
+            print("Vector index disabled: install numpy and unset VECTOR_INDEX=off")
+            raise SystemExit(1)
+        init_database()
+        with get_write_db() as conn:
+            refresh_vector_index(conn, force=True)
+        return
+        
+    if args.migrate_storage:
+        init_database()
+        with get_write_db() as conn:
+            started = time.perf_counter()
+            size_before = database_size(conn)
+            count = migrate_storage(conn, args.migrate_storage)
+            conn.commit()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+            size_after = database_size(conn)
+        print(f"Converted {count} workflows to {args.migrate_storage} storage "
+              f"in {time.perf_counter() - started:.2f}s")
+        print(f"  Database size: {size_before / 1048576:.1f} MB -> {size_after / 1048576:.1f} MB "
+              f"({100 * (size_after / max(size_before, 1) - 1):+.0f}%)")
+        if args.migrate_storage != WORKFLOW_STORAGE:
+            print(f"  Set WORKFLOW_STORAGE={args.migrate_storage} so new templates are stored the same way")
+        return
+        
     if args.stats:
         print("Database statistics:")
         init_database()
         with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM workflows")
-            total = cursor.fetchone()[0]
-            print(f"  Total workflows: {total}")
-            
-            cursor.execute("SELECT category, COUNT(*) FROM workflows GROUP BY category ORDER BY COUNT(*) DESC")
+            stats = read_index_stats(conn)
+            print(f"  Total workflows: {stats['total_workflows']}")
             print("  Categories:")
-            for row in cursor.fetchall():
-                print(f"    {row[0]}: {row[1]}")
+            for item in stats["categories"]:
+                print(f"    {item['name']}: {item['count']}")
         return
     
     if args.populate or args.force_reindex:
         print("Populating database...")
         init_database()
-        populate_database(force_reindex=args.force_reindex)
+        populate_database(
+            force_reindex=args.force_reindex,
+            workers=args.workers,
+            batch_size=args.batch_size
+        )
         print("Database populated.")
         return
     
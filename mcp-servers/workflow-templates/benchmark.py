@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""Microbenchmarks for the n8n workflow templates API."""
+
+import asyncio
+import json
+import os
+import re
+import statistics
+import time
+from pathlib import Path
+
+import api_server
+
+
+def load_corpus(templates_dir: Path, limit: int = 0):
+    """Load (services, nodes) pairs for every template in a directory."""
+    corpus = []
+    for json_file in sorted(templates_dir.glob("*.json")):
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                workflow_json = json.loads(f.read())
+        except Exception as e:
+            print(f"Skipping {json_file}: {e}")
+            continue
+        nodes = workflow_json.get("nodes", [])
+        corpus.append((api_server.extract_services_from_nodes(nodes), nodes))
+        if limit and len(corpus) >= limit:
+            break
+    return corpus
+
+
+def timed(fn, corpus, repeat: int):
+    """Return (best seconds per pass, results of the last pass)."""
+    best = float("inf")
+    results = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = [fn(services, nodes) for services, nodes in corpus]
+        best = min(best, time.perf_counter() - started)
+    return best, results
+
+
+def bench_categorize(args):
+    """Compare categorize_workflow against the precompiled CategoryClassifier."""
+    corpus = load_corpus(Path(args.templates), args.limit)
+    if not corpus:
+        print(f"No templates found in {args.templates}")
+        return
+
+    mapping = api_server.load_categories_mapping()
+    classifier = api_server.CategoryClassifier(mapping)
+
+    variants = [
+        ("categorize_workflow + reload mapping per file",
+         lambda s, n: api_server.categorize_workflow(s, n, api_server.load_categories_mapping())),
+        ("categorize_workflow, mapping loaded once",
+         lambda s, n: api_server.categorize_workflow(s, n, mapping)),
+        ("CategoryClassifier.categorize",
+         classifier.categorize),
+    ]
+
+    print(f"Categorizing {len(corpus)} workflows, best of {args.repeat} passes")
+    baseline_time = None
+    baseline_results = None
+    for label, fn in variants:
+        elapsed, results = timed(fn, corpus, args.repeat)
+        if baseline_time is None:
+            baseline_time, baseline_results = elapsed, results
+        mismatches = sum(1 for a, b in zip(baseline_results, results) if a != b)
+        print(f"  {label:<48} {elapsed * 1e6 / len(corpus):8.1f} us/workflow  "
+              f"x{baseline_time / elapsed:5.1f}  mismatches: {mismatches}")
+
+
+DEFAULT_QUERIES = [
+    "slack", "openai webhook", "google sheets", "telegram", "notion",
+    "stripe", "gmail", "github", "airtable", "discord",
+]
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def search_requests(queries):
+    """Request specs for POST /api/search, cycling through ``queries``."""
+    return [("POST", "/api/search", {"query": query, "limit": 20}) for query in queries]
+
+
+MIXED_REQUESTS = [
+    ("POST", "/api/search", {"query": "slack", "limit": 20}),
+    ("GET", "/api/services", None),
+    ("POST", "/api/search", {"query": "openai webhook", "limit": 20}),
+    ("GET", "/api/stats", None),
+    ("POST", "/api/search", {"query": "google sheets", "limit": 20}),
+    ("GET", "/api/categories", None),
+]
+
+
+async def run_load(url: str, specs, concurrency: int, total: int):
+    """Send ``total`` requests cycling through ``specs`` from ``concurrency`` clients.
+
+    Returns (seconds, latencies, errors).
+    """
+    import httpx
+
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                method, path, body = specs[i % len(specs)]
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    response.raise_for_status()
+                except Exception:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - started, latencies, errors
+
+
+def report_latencies(label: str, elapsed: float, latencies, errors: int):
+    if not latencies:
+        print(f"  {label}: no successful requests ({errors} errors)")
+        return
+    print(f"  {label:<14} {len(latencies) / elapsed:8.1f} req/s  "
+          f"p50 {percentile(latencies, 50) * 1000:7.2f} ms  "
+          f"p95 {percentile(latencies, 95) * 1000:7.2f} ms  "
+          f"p99 {percentile(latencies, 99) * 1000:7.2f} ms  "
+          f"mean {statistics.mean(latencies) * 1000:7.2f} ms  errors {errors}")
+
+
+def bench_load(args):
+    """Measure /api/search latency percentiles under concurrent load."""
+    queries = args.query or DEFAULT_QUERIES
+    print(f"POST {args.url}/api/search: {args.requests} requests, {args.concurrency} concurrent clients")
+    elapsed, latencies, errors = asyncio.run(
+        run_load(args.url, search_requests(queries), args.concurrency, args.requests)
+    )
+    report_latencies(f"{args.concurrency} clients", elapsed, latencies, errors)
+
+
+def bench_concurrency(args):
+    """Check that throughput grows with concurrent clients instead of serializing."""
+    specs = MIXED_REQUESTS if args.mixed else search_requests(DEFAULT_QUERIES)
+    workload = "mixed search/services/stats/categories" if args.mixed else "search"
+    print(f"{args.url}: {args.requests} {workload} requests per step")
+
+    baseline = None
+    for clients in [int(c) for c in args.clients.split(",")]:
+        elapsed, latencies, errors = asyncio.run(run_load(args.url, specs, clients, args.requests))
+        report_latencies(f"{clients} clients", elapsed, latencies, errors)
+        throughput = len(latencies) / elapsed
+        baseline = baseline or throughput
+        print(f"  {'':<14} scaling x{throughput / baseline:.2f} vs first step")
+
+
+BACKEND_CALLS = [
+    ("search_templates", lambda server, template_id: server.search_templates("slack", limit=20)),
+    ("search (summary)", lambda server, template_id: server.search_templates("slack", limit=20, view="summary")),
+    ("get_template_metadata", lambda server, template_id: server.get_template_metadata(template_id)),
+    ("template (summary)", lambda server, template_id: server.get_template_metadata(template_id, view="summary")),
+    ("list_categories", lambda server, template_id: server.list_categories()),
+    ("list_popular_templates", lambda server, template_id: server.list_popular_templates(10)),
+]
+
+
+async def time_backend(server, template_id: str, repeat: int):
+    """Latencies per MCP call, ``repeat`` sequential calls each."""
+    latencies = {label: [] for label, _ in BACKEND_CALLS}
+    for _ in range(repeat):
+        for label, call in BACKEND_CALLS:
+            started = time.perf_counter()
+            await call(server, template_id)
+            latencies[label].append(time.perf_counter() - started)
+    return latencies
+
+
+def bench_backend(args):
+    """Compare MCP tool latency through the HTTP API and the in-process sqlite backend."""
+    import workflow_search_mcp
+
+    workflow_search_mcp.API_URL = f"{args.url.rstrip('/')}/api"
+
+    async def run():
+        results = {}
+        for backend in ("http", "sqlite"):
+            server = workflow_search_mcp.WorkflowTemplateServer(backend)
+            # Measure the backend itself, not the response cache
+            server.cache = workflow_search_mcp.ResponseCache(max_entries=0)
+            found = await server.search_templates("", limit=1, view="summary")
+            if not found:
+                print(f"  The {backend} backend returned no templates, skipping it")
+                continue
+            await time_backend(server, found[0]["id"], 3)
+            results[backend] = await time_backend(server, found[0]["id"], args.repeat)
+        return results
+
+    print(f"HTTP {args.url} vs sqlite {api_server.DATABASE_PATH}: {args.repeat} sequential calls each")
+    results = asyncio.run(run())
+    if len(results) < 2:
+        return
+    for label, _ in BACKEND_CALLS:
+        http, local = results["http"][label], results["sqlite"][label]
+        print(f"  {label:<24} http p50 {percentile(http, 50) * 1000:7.2f} ms  p95 {percentile(http, 95) * 1000:7.2f} ms  "
+              f"sqlite p50 {percentile(local, 50) * 1000:7.2f} ms  p95 {percentile(local, 95) * 1000:7.2f} ms  "
+              f"x{percentile(http, 50) / percentile(local, 50):5.1f}")
+
+
+def known_item_queries(count: int, seed: int):
+    """Queries made of half the words of random template descriptions.
+
+    Each query expects the template it was drawn from, which is the only
+    ground truth available without labelled data.
+    """
+    import random
+
+    rng = random.Random(seed)
+    with api_server.get_db() as conn:
+        rows = conn.execute(
+            "SELECT id, description FROM workflows WHERE length(description) > 20"
+        ).fetchall()
+    queries = []
+    for row in rng.sample(rows, min(count, len(rows))):
+        # Plain words only: bm25 hands the query to FTS5 MATCH verbatim
+        words = re.findall(r"\w+", row["description"])
+        kept = sorted(rng.sample(range(len(words)), max(2, len(words) // 2)))
+        queries.append((" ".join(words[i] for i in kept), {row["id"]}))
+    return queries
+
+
+def load_queries(path: Path):
+    """(query, expected ids) pairs from a JSONL file of {"query", "expected"} objects."""
+    queries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                queries.append((entry["query"], set(entry["expected"])))
+    return queries
+
+
+def bench_semantic(args):
+    """Compare recall and latency of bm25, vector and hybrid ranking in-process."""
+    queries = load_queries(Path(args.queries)) if args.queries else known_item_queries(args.count, args.seed)
+    if not queries:
+        print("No queries to run")
+        return
+    source = args.queries or f"{len(queries)} known-item queries from template descriptions"
+    print(f"{api_server.DATABASE_PATH}: {source}, top {args.k}")
+
+    for rank in ("bm25", "vector", "hybrid"):
+        latencies = []
+        hits = 0
+        reciprocal_ranks = 0.0
+        try:
+            for query, expected in queries:
+                started = time.perf_counter()
+                results, _ = api_server.search_templates_sync(
+                    api_server.SearchRequest(query=query, rank=rank, limit=args.k, view="summary")
+                )
+                latencies.append(time.perf_counter() - started)
+                ids = [result["id"] for result in results]
+                found = [position for position, template_id in enumerate(ids, 1) if template_id in expected]
+                if found:
+                    hits += 1
+                    reciprocal_ranks += 1 / found[0]
+        except api_server.HTTPException as e:
+            print(f"  {rank:<8} unavailable: {e.detail}")
+            continue
+        print(f"  {rank:<8} recall@{args.k} {hits / len(queries):6.1%}  MRR {reciprocal_ranks / len(queries):5.3f}  "
+              f"p50 {percentile(latencies, 50) * 1000:7.2f} ms  p95 {percentile(latencies, 95) * 1000:7.2f} ms")
+
+
+def cli():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="n8n Workflow Templates API benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    categorize = subparsers.add_parser("categorize", help="Category classifier throughput")
+    categorize.add_argument("--templates", default=os.getenv("TEMPLATES_DIR", "./templates"),
+                            help="Directory of workflow JSON files")
+    categorize.add_argument("--limit", type=int, default=0, help="Only load the first N templates")
+    categorize.add_argument("--repeat", type=int, default=3, help="Timed passes per variant")
+    categorize.set_defaults(func=bench_categorize)
+
+    load = subparsers.add_parser("load", help="Search latency percentiles under concurrent load")
+    load.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    load.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    load.add_argument("--requests", type=int, default=2000, help="Total requests")
+    load.add_argument("--query", action="append", help="Search query (repeatable)")
+    load.set_defaults(func=bench_load)
+
+    concurrency = subparsers.add_parser("concurrency", help="Throughput scaling with concurrent clients")
+    concurrency.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    concurrency.add_argument("--clients", default="1,2,4,8,16", help="Comma-separated client counts")
+    concurrency.add_argument("--requests", type=int, default=1000, help="Requests per step")
+    concurrency.add_argument("--mixed", action="store_true",
+                             help="Mix slow aggregate endpoints in with searches")
+    concurrency.set_defaults(func=bench_concurrency)
+
+    backend = subparsers.add_parser("backend", help="MCP server latency: HTTP API vs in-process sqlite backend")
+    backend.add_argument("--url", default="http://localhost:8000",
+                         help="API base URL (serving the same DATABASE_PATH)")
+    backend.add_argument("--repeat", type=int, default=200, help="Calls per tool and backend")
+    backend.set_defaults(func=bench_backend)
+
+    semantic = subparsers.add_parser("semantic", help="Search recall and latency: bm25 vs vector vs hybrid")
+    semantic.add_argument("--queries", help='JSONL file of {"query": ..., "expected": [ids]} lines')
+    semantic.add_argument("--count", type=int, default=200, help="Known-item queries to generate")
+    semantic.add_argument("--seed", type=int, default=1, help="Seed for generated queries")
+    semantic.add_argument("--k", type=int, default=10, help="Results per query")
+    semantic.set_defaults(func=bench_semantic)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    cli()
@@ -4,7 +4,11 @@
 import json
 import logging
 import os
-from typing import Dict, List, Any
+import random
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
 import asyncio
 
 from mcp.server import Server, NotificationOptions
@@ -14,8 +18,39 @@ from mcp.types import Tool, TextContent
 import httpx
 
 # Configuration
+TEMPLATE_BACKEND = os.getenv("TEMPLATE_BACKEND", "http").lower()  # http (templates API) or sqlite (read workflows.db in-process)
 API_URL = os.getenv("TEMPLATE_API_URL", "http://localhost:8000/api")
 TIMEOUT = int(os.getenv("SEARCH_TIMEOUT", "5000")) / 1000
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2 = os.getenv("HTTP2", "0").lower() in ("1", "true", "yes")  # needs the h2 package
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))  # extra attempts for idempotent calls
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.2"))  # seconds, doubled per attempt
+HTTP_RETRY_MAX_BACKOFF = float(os.getenv("HTTP_RETRY_MAX_BACKOFF", "2.0"))
+RETRY_STATUSES = {502, 503, 504}
+IDEMPOTENT_POSTS = {"/search", "/templates/batch"}  # read-only despite POST
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))  # consecutive failed calls, 0 disables
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "10"))  # seconds open before a trial call
+TEMPLATE_FIELDS = ["id", "name", "description", "workflow_json", "nodes", "connections", "statistics"]
+SEARCH_FIELDS = [
+    "id", "name", "description", "category", "nodes_count", "services",
+    "trigger_type", "complexity", "use_cases", "score", "highlights"
+]
+CACHE_MAX_ENTRIES = int(os.getenv("MCP_CACHE_MAX_ENTRIES", "512"))  # 0 disables the response cache
+CACHE_MAX_BYTES = int(os.getenv("MCP_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+CACHE_TTLS = {  # seconds a response is reused before asking the API again; 0 = never cache
+    "search_templates": float(os.getenv("MCP_CACHE_TTL_SEARCH", "60")),
+    "get_template_metadata": float(os.getenv("MCP_CACHE_TTL_TEMPLATE", "600")),
+    "get_templates_batch": float(os.getenv("MCP_CACHE_TTL_BATCH", "300")),
+    "find_similar_templates": float(os.getenv("MCP_CACHE_TTL_SIMILAR", "600")),
+    "list_categories": float(os.getenv("MCP_CACHE_TTL_CATEGORIES", "3600")),
+    "list_popular_templates": float(os.getenv("MCP_CACHE_TTL_POPULAR", "3600")),
+}
+OUTPUT_FORMAT = os.getenv("MCP_OUTPUT_FORMAT", "pretty").lower()  # pretty (indented JSON) or compact
+OUTPUT_MAX_BYTES = int(os.getenv("MCP_OUTPUT_MAX_BYTES", "0"))  # default compact budget, 0 = unlimited
+CHARS_PER_TOKEN = 4  # rough bytes-per-token used to turn max_tokens into a byte budget
+PARAMETER_STRING_LIMITS = (1024, 256, 64)  # successive truncation lengths for node parameter strings
 
 # Setup logging
 log_level = os.getenv("LOG_LEVEL", "ERROR").upper()
@@ -25,66 +60,696 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class WorkflowTemplateServer:
+def dump_compact(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+def output_size(value: Any) -> int:
+    return len(dump_compact(value).encode("utf-8"))
+
+def map_nodes(value: Any, fn) -> Any:
+    """Copy a tool result with ``fn`` applied to every workflow node.
+
+    Only the containers on the way to a node list are copied, so cached
+    responses are never modified.
+    """
+    if isinstance(value, list):
+        return [map_nodes(item, fn) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if isinstance(value.get("templates"), list):
+        return {**value, "templates": map_nodes(value["templates"], fn)}
+    copy = dict(value)
+    if isinstance(value.get("nodes"), list):
+        copy["nodes"] = [fn(node) for node in value["nodes"]]
+    workflow = value.get("workflow_json")
+    if isinstance(workflow, dict) and isinstance(workflow.get("nodes"), list):
+        copy["workflow_json"] = {**workflow, "nodes": [fn(node) for node in workflow["nodes"]]}
+    return copy
+
+def has_parameters(node: Any) -> bool:
+    return isinstance(node, dict) and "parameters" in node
+
+def iter_nodes(value: Any) -> List[Any]:
+    """Return every workflow node in a tool result, in map_nodes() order."""
+    found = []
+    map_nodes(value, lambda node: found.append(node) or node)
+    return found
+
+def truncate_strings(value: Any, limit: int, report: Dict[str, int]) -> Any:
+    """Shorten every string longer than ``limit``, noting how much was cut."""
+    if isinstance(value, str):
+        if len(value) <= limit:
+            return value
+        report["truncated_strings"] += 1
+        return f"{value[:limit]}…[{len(value) - limit} chars omitted]"
+    if isinstance(value, list):
+        return [truncate_strings(item, limit, report) for item in value]
+    if isinstance(value, dict):
+        return {key: truncate_strings(item, limit, report) for key, item in value.items()}
+    return value
+
+def drop_duplicate_bodies(value: Any, report: Dict[str, int]) -> Any:
+    """Leave out top-level nodes/connections that repeat workflow_json's."""
+    if isinstance(value, dict) and isinstance(value.get("templates"), list):
+        return {**value, "templates": [drop_duplicate_bodies(item, report) for item in value["templates"]]}
+    if not isinstance(value, dict) or not isinstance(value.get("workflow_json"), dict):
+        return value
+    workflow = value["workflow_json"]
+    omitted = {}
+    for field, empty in (("nodes", []), ("connections", {})):
+        if field in value and value[field] == workflow.get(field, empty):
+            omitted[field] = f"same as workflow_json.{field}"
+    if not omitted:
+        return value
+    report["deduplicated_fields"] += len(omitted)
+    trimmed = {key: item for key, item in value.items() if key not in omitted}
+    trimmed["_omitted"] = omitted
+    return trimmed
+
+def fit_output(value: Any, max_bytes: int, report: Dict[str, int]) -> Any:
+    """Shrink a tool result until its compact JSON fits in ``max_bytes``.
+
+    Steps, each only taken if the previous one was not enough: truncate
+    long strings in node parameters (1024, 256, then 64 chars), replace
+    whole node parameter objects with a size marker, largest first, and
+    finally drop trailing results from lists. The budget is best effort:
+    node structure and the first result are always kept. The same input
+    and budget always produce the same output.
+    """
+    size = output_size(value)
+    for limit in PARAMETER_STRING_LIMITS:
+        if size <= max_bytes:
+            return value
+        value = map_nodes(value, lambda node: {
+            **node, "parameters": truncate_strings(node["parameters"], limit, report)
+        } if has_parameters(node) else node)
+        size = output_size(value)
+    if size <= max_bytes:
+        return value
+    
+    sizes = [(output_size(node["parameters"]), position)
+             for position, node in enumerate(iter_nodes(value)) if has_parameters(node)]
+    omit = set()
+    for parameters_size, position in sorted(sizes, key=lambda item: (-item[0], item[1])):
+        if size <= max_bytes:
+            break
+        marker = {"_omitted": f"{parameters_size} bytes"}
+        size -= parameters_size - output_size(marker)
+        omit.add(position)
+    if omit:
+        positions = iter(range(len(iter_nodes(value))))
+        def omit_parameters(node):
+            if next(positions) in omit:
+                report["omitted_parameters"] += 1
+                return {**node, "parameters": {"_omitted": f"{output_size(node['parameters'])} bytes"}}
+            return node
+        value = map_nodes(value, omit_parameters)
+        size = output_size(value)
+    
+    items = value if isinstance(value, list) else value.get("templates") if isinstance(value, dict) else None
+    if size <= max_bytes or not isinstance(items, list) or len(items) < 2:
+        return value
+    # Drop trailing results, sizing the shortened list without re-serializing it
+    item_sizes = [output_size(item) for item in items]
+    full_size, kept = size, len(items)
+    while kept > 1 and size > max_bytes:
+        kept -= 1
+        marker = {"_omitted": f"{len(items) - kept} more results"}
+        size = full_size - sum(item_sizes[kept:]) + output_size(marker) + kept - (len(items) - 1)
+    report["omitted_items"] = len(items) - kept
+    trimmed = items[:kept] + [marker]
+    return trimmed if isinstance(value, list) else {**value, "templates": trimmed}
+
+def render_output(value: Any, output: str = OUTPUT_FORMAT, max_bytes: int = OUTPUT_MAX_BYTES) -> tuple:
+    """Serialize a tool result; returns (text, report).
+
+    ``pretty`` is indented JSON, as before. ``compact`` drops whitespace and
+    duplicated template bodies and, given a byte budget, truncates node
+    parameters with markers saying what was left out (see fit_output).
+    """
+    pretty = json.dumps(value, indent=2)
+    report = {"format": output, "pretty_bytes": len(pretty.encode("utf-8"))}
+    if output != "compact" and not max_bytes:
+        report["bytes"] = report["pretty_bytes"]
+        return pretty, report
+    
+    report["format"] = "compact"
+    counts = {"deduplicated_fields": 0, "truncated_strings": 0, "omitted_parameters": 0, "omitted_items": 0}
+    value = drop_duplicate_bodies(value, counts)
+    if max_bytes:
+        value = fit_output(value, max_bytes, counts)
+    text = dump_compact(value)
+    report["bytes"] = len(text.encode("utf-8"))
+    report.update({key: count for key, count in counts.items() if count})
+    return text, report
+
+class CacheEntry:
+    __slots__ = ("tool", "value", "size", "etag", "generation", "expires_at")
+
+    def __init__(self, tool: str, value: Any, size: int, etag: Optional[str], generation: Optional[int]):
+        self.tool = tool
+        self.value = value
+        self.size = size
+        self.etag = etag
+        self.generation = generation
+        self.expires_at = 0.0
+
+class ResponseCache:
+    """Bounded LRU of decoded API responses with a TTL per tool.
+
+    An entry is served without a request while its TTL lasts and the API
+    has not reported a newer index generation since it was stored. After
+    that, entries with an ETag are revalidated with If-None-Match and the
+    rest are fetched again.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES,
+                 ttls: Dict[str, float] = CACHE_TTLS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self.entries: "OrderedDict[tuple, CacheEntry]" = OrderedDict()
+        self.size = 0
+        self.generation: Optional[int] = None  # newest X-Index-Generation seen
+        self.evictions = 0
+        self.counters = {tool: {"hits": 0, "misses": 0, "revalidated": 0} for tool in ttls}
+
+    def lookup(self, key: tuple) -> Optional[CacheEntry]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        if entry.expires_at <= time.monotonic():
+            return False
+        return self.generation is None or entry.generation is None or entry.generation >= self.generation
+
+    def observe(self, headers) -> Optional[int]:
+        """Track the index generation reported by a response."""
+        value = headers.get("x-index-generation")
+        if value is None:
+            return None
+        generation = int(value)
+        if self.generation is None or generation > self.generation:
+            self.generation = generation
+        return generation
+
+    def touch(self, entry: CacheEntry, generation: Optional[int]):
+        """Extend an entry the API confirmed is still current."""
+        entry.generation = generation
+        entry.expires_at = time.monotonic() + self.ttls.get(entry.tool, 0)
+
+    def put(self, key: tuple, entry: CacheEntry):
+        ttl = self.ttls.get(entry.tool, 0)
+        if ttl <= 0 or self.max_entries <= 0 or entry.size > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= old.size
+        entry.expires_at = time.monotonic() + ttl
+        self.entries[key] = entry
+        self.size += entry.size
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.size
+            self.evictions += 1
+
+    def record(self, tool: str, outcome: str):
+        self.counters.setdefault(tool, {"hits": 0, "misses": 0, "revalidated": 0})[outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "index_generation": self.generation,
+            "ttls": self.ttls,
+            "tools": self.counters,
+        }
+
+class TemplateAPIError(Exception):
+    """The backend answered with an error status (e.g. 404, 422)."""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+class BackendUnavailable(Exception):
+    """The backend could not be reached (retries exhausted or circuit open)."""
+
+class CircuitBreaker:
+    """Fail fast after ``threshold`` consecutive failed calls.
+
+    The breaker then stays open for ``reset_after`` seconds, after which one
+    trial call goes through (half-open): success closes it, failure opens
+    it again.
+    """
+
+    def __init__(self, threshold: int = BREAKER_FAILURES, reset_after: float = BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+        self.counters = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_after else "open"
+
+    def before_call(self):
+        """Raise BackendUnavailable unless a call may go through now."""
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half-open" and not self.trial:
+            self.trial = True
+            return
+        self.counters["rejected"] += 1
+        retry_in = max(0.0, self.opened_at + self.reset_after - time.monotonic())
+        raise BackendUnavailable(f"Template API unavailable, circuit open (next attempt in {retry_in:.1f}s)")
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def failure(self):
+        self.failures += 1
+        if self.threshold > 0 and (self.trial or (self.opened_at is None and self.failures >= self.threshold)):
+            self.opened_at = time.monotonic()
+            self.counters["opened"] += 1
+        self.trial = False
+
+    def abandon(self):
+        """Release the trial slot of a call that was cancelled."""
+        self.trial = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures, **self.counters}
+
+class BackendResponse:
+    __slots__ = ("status_code", "headers", "value", "size")
+
+    def __init__(self, status_code: int, headers, value: Any = None, size: int = 0):
+        self.status_code = status_code
+        self.headers = headers
+        self.value = value
+        self.size = size
+
+class HttpBackend:
+    """Call the templates API over HTTP.
+
+    Uses one pooled keep-alive client. Idempotent calls are retried on
+    connection errors, timeouts and 502/503/504 with jittered exponential
+    backoff, and a circuit breaker fails fast while the API is down.
+    """
+    name = "http"
+
+    def __init__(self):
+        self.limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        )
+        self.http2 = HTTP2
+        try:
+            self.client = httpx.AsyncClient(timeout=TIMEOUT, limits=self.limits, http2=self.http2)
+        except ImportError:
+            logger.warning("HTTP2 requested but the h2 package is not installed, using HTTP/1.1")
+            self.http2 = False
+            self.client = httpx.AsyncClient(timeout=TIMEOUT, limits=self.limits)
+        self.breaker = CircuitBreaker()
+        self.retries = 0
+
+    async def request(self, method: str, path: str, params: Dict[str, Any], body: Dict[str, Any],
+                      headers: Optional[Dict[str, str]]) -> BackendResponse:
+        self.breaker.before_call()
+        attempts = 1 + (HTTP_RETRIES if method == "GET" or path in IDEMPOTENT_POSTS else 0)
+        try:
+            for attempt in range(attempts):
+                if attempt:
+                    self.retries += 1
+                    backoff = min(HTTP_RETRY_MAX_BACKOFF, HTTP_RETRY_BACKOFF * 2 ** (attempt - 1))
+                    await asyncio.sleep(random.uniform(0, backoff))
+                try:
+                    response = await self.client.request(
+                        method, f"{API_URL}{path}", params=params, json=body, headers=headers
+                    )
+                except httpx.TransportError as e:
+                    error = f"{type(e).__name__}: {e}"
+                    continue
+                if response.status_code not in RETRY_STATUSES:
+                    break
+                error = f"HTTP {response.status_code}"
+            else:
+                self.breaker.failure()
+                raise BackendUnavailable(f"Template API unavailable after {attempts} attempt(s): {error}")
+        except asyncio.CancelledError:
+            self.breaker.abandon()
+            raise
+        
+        self.breaker.success()
+        if response.status_code == 304:
+            return BackendResponse(304, response.headers)
+        if response.is_error:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            raise TemplateAPIError(response.status_code, detail)
+        return BackendResponse(response.status_code, response.headers, response.json(), len(response.content))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "api_url": API_URL,
+            "http2": self.http2,
+            "max_connections": HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": HTTP_MAX_KEEPALIVE,
+            "retries": self.retries,
+            "breaker": self.breaker.stats(),
+        }
+
+class SqliteBackend:
+    """Answer the API routes in-process from the workflows.db the API built.
+
+    Runs api_server's query functions (and its search cache) on its pooled
+    read-only connections, so there is no HTTP hop and no API container
+    dependency. DATABASE_PATH must point at the same database (e.g. the
+    API's data volume); the backend never creates or writes it.
+    """
+    name = "sqlite"
+
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=TIMEOUT)
+        # Imported here so the HTTP backend does not need FastAPI installed
+        import api_server
+        from pydantic import ValidationError
+        from pydantic_core import to_json, to_jsonable_python
+        self.api = api_server
+        self.check_database()
+        self.validation_error = ValidationError
+        self.to_json = to_json
+        self.to_jsonable_python = to_jsonable_python
+
+    def check_database(self):
+        """Fail fast, with the path in the message, if DATABASE_PATH is not a built index."""
+        path = self.api.DATABASE_PATH
+        if not path.is_file():
+            raise RuntimeError(f"TEMPLATE_BACKEND=sqlite: no database at DATABASE_PATH={path} "
+                               f"(point it at the workflows.db the API builds)")
+        with self.api.get_db() as conn:
+            try:
+                conn.execute("SELECT value FROM index_meta WHERE key = 'generation'").fetchone()
+            except sqlite3.Error as e:
+                raise RuntimeError(f"TEMPLATE_BACKEND=sqlite: {path} is not a templates index ({e})") from e
+
+    async def request(self, method: str, path: str, params: Dict[str, Any], body: Dict[str, Any],
+                      headers: Optional[Dict[str, str]]) -> BackendResponse:
+        try:
+            return await self.dispatch(method, path, params, body, headers)
+        except self.api.HTTPException as e:
+            raise TemplateAPIError(e.status_code, e.detail) from e
+        except self.validation_error as e:
+            raise TemplateAPIError(422, str(e)) from e
+
+    async def dispatch(self, method: str, path: str, params: Dict[str, Any], body: Dict[str, Any],
+                       headers: Optional[Dict[str, str]]) -> BackendResponse:
+        api = self.api
+        params = params or {}
+        if_none_match = (headers or {}).get("If-None-Match")
+        generation = await api.current_generation()
+        response_headers = {"x-index-generation": str(generation)}
+        
+        if path == "/search":
+            content, _, _ = await api.cached_search(api.SearchRequest(**body), generation)
+            return BackendResponse(200, response_headers, json.loads(content), len(content))
+        
+        if path == "/templates/batch":
+            request = api.TemplateBatchRequest(**body)
+            projection = api.resolve_projection(
+                api.TEMPLATE_FIELDS, request.fields, request.exclude, request.view, api.TEMPLATE_SUMMARY_FIELDS
+            )
+            content = await api.run_db(api.fetch_templates_batch_sync, request.ids, projection)
+            return BackendResponse(200, response_headers, json.loads(content), len(content))
+        
+        if path.startswith("/template/") and not path.endswith("/similar"):
+            template_id = path[len("/template/"):]
+            projection = api.resolve_projection(
+                api.TEMPLATE_FIELDS, api.split_fields(params.get("fields")), api.split_fields(params.get("exclude")),
+                params.get("view", "full"), api.TEMPLATE_SUMMARY_FIELDS
+            )
+            if if_none_match and await api.run_db(api.template_etag_sync, template_id, projection) == if_none_match:
+                return BackendResponse(304, response_headers)
+            content, etag = await api.run_db(api.fetch_template_sync, template_id, projection)
+            if etag:
+                response_headers["etag"] = etag
+            return BackendResponse(200, response_headers, json.loads(content), len(content))
+        
+        # Generation-tagged listings, like the API's check_not_modified()
+        response_headers["etag"] = f'"g{generation}"'
+        if if_none_match == response_headers["etag"]:
+            return BackendResponse(304, response_headers)
+        if path == "/categories":
+            return self.respond(await api.run_db(api.list_categories_sync), response_headers)
+        if path == "/popular":
+            limit = int(params.get("limit", 10))
+            if limit > 50:
+                raise api.HTTPException(status_code=422, detail="limit must be at most 50")
+            templates, _ = await api.run_db(api.list_popular_templates_sync, limit)
+            return self.respond(templates, response_headers)
+        if path.startswith("/template/"):
+            template_id = path[len("/template/"):-len("/similar")]
+            limit = int(params.get("limit", 10))
+            if not 1 <= limit <= 50:
+                raise api.HTTPException(status_code=422, detail="limit must be between 1 and 50")
+            templates = await api.run_db(
+                api.find_similar_templates_sync, template_id, limit, float(params.get("min_similarity", 0.0))
+            )
+            return self.respond(templates, response_headers)
+        raise ValueError(f"Unsupported path for the sqlite backend: {method} {path}")
+
+    def respond(self, value: Any, headers: Dict[str, str]) -> BackendResponse:
+        return BackendResponse(200, headers, self.to_jsonable_python(value), len(self.to_json(value)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"database": str(self.api.DATABASE_PATH)}
+
+TEMPLATE_BACKENDS = {"http": HttpBackend, "sqlite": SqliteBackend}
+
+class WorkflowTemplateServer:
+    def __init__(self, backend: Optional[str] = None):
+        backend = backend or TEMPLATE_BACKEND
+        if backend not in TEMPLATE_BACKENDS:
+            raise ValueError(f"Unknown TEMPLATE_BACKEND '{backend}', expected one of {', '.join(TEMPLATE_BACKENDS)}")
+        self.backend = TEMPLATE_BACKENDS[backend]()
+        self.cache = ResponseCache()
+        self.in_flight: Dict[tuple, asyncio.Future] = {}
+        self.flight_counters: Dict[str, Dict[str, int]] = {}
+        self.output_counters = {"calls": 0, "compact_calls": 0, "pretty_bytes": 0, "bytes": 0}
+        self.call_counters: Dict[str, Dict[str, float]] = {}
+        
+    async def fetch(self, tool: str, method: str, path: str, params: Dict[str, Any] = None,
+                    body: Dict[str, Any] = None) -> Any:
+        """Call the API through the response cache and return the decoded JSON.
+
+        Concurrent identical calls that miss the cache share one upstream
+        request: every caller gets its result or its exception, and a caller
+        being cancelled does not cancel the request for the others.
+        """
+        key = (method, path, json.dumps(params, sort_keys=True), json.dumps(body, sort_keys=True))
+        entry = self.cache.lookup(key)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.record(tool, "hits")
+            return entry.value
+        
+        flight = self.in_flight.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(self.request(tool, key, entry, method, path, params, body))
+            self.in_flight[key] = flight
+            flight.add_done_callback(lambda done: self.land(key, done))
+            self.record_flight(tool, "upstream")
+        else:
+            self.record_flight(tool, "coalesced")
+        return await asyncio.shield(flight)
+        
+    def land(self, key: tuple, flight: asyncio.Future):
+        """Forget a finished upstream request, marking its exception as retrieved."""
+        if self.in_flight.get(key) is flight:
+            del self.in_flight[key]
+        if not flight.cancelled():
+            flight.exception()
+        
+    def record_flight(self, tool: str, outcome: str):
+        self.flight_counters.setdefault(tool, {"upstream": 0, "coalesced": 0})[outcome] += 1
+        
+    async def request(self, tool: str, key: tuple, entry: Optional[CacheEntry], method: str, path: str,
+                      params: Dict[str, Any], body: Dict[str, Any]) -> Any:
+        """Send one backend request, revalidating ``entry`` if it has an ETag."""
+        headers = {"If-None-Match": entry.etag} if entry is not None and entry.etag else None
+        started = time.perf_counter()
+        try:
+            response = await self.backend.request(method, path, params, body, headers)
+        except Exception:
+            self.record_call(tool, started, failed=True)
+            raise
+        self.record_call(tool, started)
+        generation = self.cache.observe(response.headers)
+        if response.status_code == 304 and entry is not None:
+            self.cache.touch(entry, generation)
+            self.cache.record(tool, "revalidated")
+            return entry.value
+        self.cache.put(key, CacheEntry(tool, response.value, response.size, response.headers.get("etag"), generation))
+        self.cache.record(tool, "misses")
+        return response.value
         
     async def search_templates(
         self, 
         query: str, 
         category: str = None, 
         trigger_type: str = None,
-        limit: int = 20
+        limit: int = 20,
+        rank: str = "bm25",
+        highlight: bool = False,
+        services: List[str] = None,
+        services_mode: str = "all",
+        fields: List[str] = None,
+        exclude: List[str] = None,
+        view: str = "full"
     ) -> List[Dict[str, Any]]:
         """Search workflow templates."""
+        return await self.fetch(
+            "search_templates", "POST", "/search",
+            body={
+                "query": query,
+                "category": category,
+                "trigger_type": trigger_type,
+                "limit": limit,
+                "rank": rank,
+                "highlight": highlight,
+                "services": services,
+                "services_mode": services_mode,
+                "fields": fields,
+                "exclude": exclude,
+                "view": view
+            }
+        )
+            
+    async def get_template_metadata(
+        self,
+        template_id: str,
+        fields: List[str] = None,
+        exclude: List[str] = None,
+        view: str = "full"
+    ) -> Dict[str, Any]:
+        """Get detailed template metadata, optionally projected to fewer fields (None if not found)."""
+        params = {"view": view}
+        if fields:
+            params["fields"] = ",".join(fields)
+        if exclude:
+            params["exclude"] = ",".join(exclude)
         try:
-            response = await self.client.post(
-                f"{API_URL}/search",
-                json={
-                    "query": query,
-                    "category": category,
-                    "trigger_type": trigger_type,
-                    "limit": limit
-                }
-            )
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            logger.error(f"Search error: {e}")
-            return []
-            
-    async def get_template_metadata(self, template_id: str) -> Dict[str, Any]:
-        """Get detailed template metadata."""
+            return await self.fetch("get_template_metadata", "GET", f"/template/{template_id}", params=params)
+        except TemplateAPIError as e:
+            if e.status_code == 404:
+                return None
+            raise
+            
+    async def get_templates_batch(
+        self,
+        template_ids: List[str],
+        fields: List[str] = None,
+        exclude: List[str] = None,
+        view: str = "full"
+    ) -> Dict[str, Any]:
+        """Get several templates in one request, in the order asked for."""
+        return await self.fetch(
+            "get_templates_batch", "POST", "/templates/batch",
+            body={"ids": template_ids, "fields": fields, "exclude": exclude, "view": view}
+        )
+            
+    async def find_similar_templates(
+        self,
+        template_id: str,
+        limit: int = 10,
+        min_similarity: float = 0.0
+    ) -> List[Dict[str, Any]]:
+        """Get templates with the same structure as a template, most similar first (None if not found)."""
         try:
-            response = await self.client.get(f"{API_URL}/template/{template_id}")
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            logger.error(f"Metadata error: {e}")
-            return None
+            return await self.fetch(
+                "find_similar_templates", "GET", f"/template/{template_id}/similar",
+                params={"limit": limit, "min_similarity": min_similarity}
+            )
+        except TemplateAPIError as e:
+            if e.status_code == 404:
+                return None
+            raise
             
     async def list_categories(self) -> Dict[str, Any]:
         """List all categories."""
-        try:
-            response = await self.client.get(f"{API_URL}/categories")
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            logger.error(f"Categories error: {e}")
-            return {"categories": []}
+        return await self.fetch("list_categories", "GET", "/categories")
             
     async def list_popular_templates(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get popular templates."""
-        try:
-            response = await self.client.get(
-                f"{API_URL}/popular",
-                params={"limit": limit}
-            )
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            logger.error(f"Popular templates error: {e}")
-            return []
+        return await self.fetch("list_popular_templates", "GET", "/popular", params={"limit": limit})
+            
+    def record_call(self, tool: str, started: float, failed: bool = False):
+        """Count one backend call and its latency for get_server_diagnostics."""
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        counters = self.call_counters.setdefault(tool, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+        counters["calls"] += 1
+        counters["errors"] += failed
+        counters["total_ms"] += elapsed_ms
+        counters["max_ms"] = max(counters["max_ms"], elapsed_ms)
+            
+    def record_output(self, report: Dict[str, Any]):
+        """Accumulate tool output sizes for get_server_diagnostics."""
+        self.output_counters["calls"] += 1
+        self.output_counters["compact_calls"] += report["format"] == "compact"
+        self.output_counters["pretty_bytes"] += report["pretty_bytes"]
+        self.output_counters["bytes"] += report["bytes"]
+            
+    def get_server_diagnostics(self) -> Dict[str, Any]:
+        """Report backend health and latency, response cache, request coalescing and output size statistics."""
+        calls = {
+            tool: {**{key: round(value, 3) for key, value in counters.items()},
+                   "mean_ms": round(counters["total_ms"] / counters["calls"], 3)}
+            for tool, counters in self.call_counters.items()
+        }
+        return {
+            "backend": self.backend.name,
+            **self.backend.stats(),
+            "calls": calls,
+            "cache": self.cache.stats(),
+            "coalescing": {"in_flight": len(self.in_flight), "tools": self.flight_counters},
+            "output": self.output_counters,
+        }
+
+# Output options accepted by every data tool
+OUTPUT_PROPERTIES = {
+    "output": {
+        "type": "string",
+        "enum": ["pretty", "compact"],
+        "description": "'compact' drops whitespace and duplicated template bodies",
+        "default": OUTPUT_FORMAT
+    },
+    "max_tokens": {
+        "type": "integer",
+        "minimum": 1,
+        "description": f"Approximate output budget (~{CHARS_PER_TOKEN} bytes per token); large node parameters are truncated with markers"
+    },
+    "max_bytes": {
+        "type": "integer",
+        "minimum": 1,
+        "description": "Output budget in bytes (implies compact output)"
+    }
+}
+OUTPUT_REPORT_COUNTS = ["deduplicated_fields", "truncated_strings", "omitted_parameters", "omitted_items"]
 
 # Create server instance
 server = Server("workflow-templates")
@@ -116,7 +781,47 @@ async def handle_list_tools() -> List[Tool]:
                         "type": "integer",
                         "description": "Maximum results to return",
                         "default": 20
-                    }
+                    },
+                    "services": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Only templates using these services (e.g. ['Slack', 'Stripe'])"
+                    },
+                    "services_mode": {
+                        "type": "string",
+                        "enum": ["all", "any"],
+                        "description": "Require all listed services or at least one",
+                        "default": "all"
+                    },
+                    "rank": {
+                        "type": "string",
+                        "enum": ["bm25", "nodes_count", "vector", "hybrid"],
+                        "description": "Order by keyword relevance (bm25), workflow size, "
+                                       "semantic similarity (vector) or both fused (hybrid)",
+                        "default": "bm25"
+                    },
+                    "highlight": {
+                        "type": "boolean",
+                        "description": "Include highlighted name and description snippet",
+                        "default": False
+                    },
+                    "fields": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": SEARCH_FIELDS},
+                        "description": "Only return these result fields"
+                    },
+                    "exclude": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": SEARCH_FIELDS},
+                        "description": "Leave these result fields out"
+                    },
+                    "view": {
+                        "type": "string",
+                        "enum": ["full", "summary"],
+                        "description": "'summary' returns only id, name, description, category and score",
+                        "default": "full"
+                    },
+                    **OUTPUT_PROPERTIES
                 },
                 "required": ["query"]
             }
@@ -130,17 +835,96 @@ async def handle_list_tools() -> List[Tool]:
                     "template_id": {
                         "type": "string",
                         "description": "Template ID"
-                    }
+                    },
+                    "fields": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": TEMPLATE_FIELDS},
+                        "description": "Only return these fields"
+                    },
+                    "exclude": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": TEMPLATE_FIELDS},
+                        "description": "Leave these fields out (e.g. ['workflow_json'] when nodes are enough)"
+                    },
+                    "view": {
+                        "type": "string",
+                        "enum": ["full", "summary"],
+                        "description": "'summary' returns id, name, description and statistics without the node bodies",
+                        "default": "full"
+                    },
+                    **OUTPUT_PROPERTIES
                 },
                 "required": ["template_id"]
             }
         ),
+        Tool(
+            name="find_similar_templates",
+            description="Find workflow templates structurally similar to a given template "
+                        "(same node types, services and connections)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "template_id": {
+                        "type": "string",
+                        "description": "Template ID to find neighbours of"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Number of templates to return",
+                        "default": 10,
+                        "minimum": 1,
+                        "maximum": 50
+                    },
+                    "min_similarity": {
+                        "type": "number",
+                        "description": "Minimum estimated Jaccard similarity, from 0 to 1",
+                        "default": 0.0
+                    },
+                    **OUTPUT_PROPERTIES
+                },
+                "required": ["template_id"]
+            }
+        ),
+        Tool(
+            name="get_templates_batch",
+            description="Get several workflow templates at once, e.g. the candidates from a search",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "template_ids": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Template IDs, returned in this order",
+                        "minItems": 1,
+                        "maxItems": 100
+                    },
+                    "fields": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": TEMPLATE_FIELDS},
+                        "description": "Only return these fields"
+                    },
+                    "exclude": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": TEMPLATE_FIELDS},
+                        "description": "Leave these fields out"
+                    },
+                    "view": {
+                        "type": "string",
+                        "enum": ["full", "summary"],
+                        "description": "'summary' returns id, name, description and statistics without the node bodies",
+                        "default": "full"
+                    },
+                    **OUTPUT_PROPERTIES
+                },
+                "required": ["template_ids"]
+            }
+        ),
         Tool(
             name="list_categories",
             description="List all available workflow categories with counts",
             inputSchema={
                 "type": "object",
-                "properties": {}
+                "properties": {**OUTPUT_PROPERTIES}
             }
         ),
         Tool(
@@ -153,46 +937,93 @@ async def handle_list_tools() -> List[Tool]:
                         "type": "integer",
                         "description": "Number of templates to return",
                         "default": 10
-                    }
+                    },
+                    **OUTPUT_PROPERTIES
                 }
             }
+        ),
+        Tool(
+            name="get_server_diagnostics",
+            description="Show template backend health and latency, response cache hit/miss, request coalescing and output size statistics",
+            inputSchema={
+                "type": "object",
+                "properties": {}
+            }
         )
     ]
 
+def tool_output(value: Any, options: Dict[str, Any]) -> List[TextContent]:
+    """Render a tool result in the requested output mode, noting any size reduction."""
+    max_bytes = options.get("max_bytes") or OUTPUT_MAX_BYTES
+    if options.get("max_tokens"):
+        max_bytes = options["max_tokens"] * CHARS_PER_TOKEN
+    text, report = render_output(value, options.get("output", OUTPUT_FORMAT), max_bytes)
+    template_server.record_output(report)
+    content = [TextContent(type="text", text=text)]
+    if report["format"] == "compact":
+        reduction = 100 * (1 - report["bytes"] / report["pretty_bytes"]) if report["pretty_bytes"] else 0
+        details = [f"{key.replace('_', ' ')}: {report[key]}" for key in OUTPUT_REPORT_COUNTS if key in report]
+        content.append(TextContent(
+            type="text",
+            text=f"[compact output: {report['pretty_bytes']} -> {report['bytes']} bytes (-{reduction:.0f}%)"
+                 + "".join(f"; {detail}" for detail in details) + "]"
+        ))
+    return content
+
 @server.call_tool()
 async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
     """Handle tool calls."""
+    arguments = dict(arguments or {})
+    options = {key: arguments.pop(key) for key in OUTPUT_PROPERTIES if key in arguments}
     try:
         if name == "search_templates":
             results = await template_server.search_templates(**arguments)
-            return [TextContent(
-                type="text",
-                text=json.dumps(results, indent=2)
-            )]
+            return tool_output(results, options)
             
         elif name == "get_template_metadata":
             metadata = await template_server.get_template_metadata(
-                arguments["template_id"]
+                arguments["template_id"],
+                fields=arguments.get("fields"),
+                exclude=arguments.get("exclude"),
+                view=arguments.get("view", "full")
             )
-            return [TextContent(
-                type="text",
-                text=json.dumps(metadata, indent=2) if metadata else "Template not found"
-            )]
+            if not metadata:
+                return [TextContent(type="text", text="Template not found")]
+            return tool_output(metadata, options)
+            
+        elif name == "get_templates_batch":
+            batch = await template_server.get_templates_batch(
+                arguments["template_ids"],
+                fields=arguments.get("fields"),
+                exclude=arguments.get("exclude"),
+                view=arguments.get("view", "full")
+            )
+            return tool_output(batch, options)
+            
+        elif name == "find_similar_templates":
+            templates = await template_server.find_similar_templates(
+                arguments["template_id"],
+                limit=arguments.get("limit", 10),
+                min_similarity=arguments.get("min_similarity", 0.0)
+            )
+            if templates is None:
+                return [TextContent(type="text", text="Template not found")]
+            return tool_output(templates, options)
             
         elif name == "list_categories":
             categories = await template_server.list_categories()
-            return [TextContent(
-                type="text",
-                text=json.dumps(categories, indent=2)
-            )]
+            return tool_output(categories, options)
             
         elif name == "list_popular_templates":
             templates = await template_server.list_popular_templates(
                 arguments.get("limit", 10)
             )
+            return tool_output(templates, options)
+            
+        elif name == "get_server_diagnostics":
             return [TextContent(
                 type="text",
-                text=json.dumps(templates, indent=2)
+                text=json.dumps(template_server.get_server_diagnostics(), indent=2)
             )]
             
         else: